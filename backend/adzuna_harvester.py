@@ -0,0 +1,171 @@
+# backend/adzuna_harvester.py
+import asyncio
+import math
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from adzuna_service import AdzunaService, adzuna_service
+
+# HTTP statuses worth retrying after a pause
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AdzunaHarvester:
+    """Concurrent multi-page Adzuna fetcher on a pooled async HTTP client.
+
+    Every (query, location) pair is walked page by page: page 1 reports the
+    total result count, then the remaining pages are fetched concurrently
+    under a shared concurrency limit. Transformed jobs are streamed out as
+    each page arrives. `cursors` remembers the next page per pair so a later
+    harvest can continue where the last one stopped.
+    """
+
+    def __init__(self, service: AdzunaService = adzuna_service, max_concurrency: int = 8,
+                 results_per_page: int = 50, max_pages: int = 5, max_retries: int = 4,
+                 backoff_base: float = 1.0, timeout: float = 10.0, base_url: Optional[str] = None):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.results_per_page = results_per_page
+        self.max_pages = max_pages
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        # Point at a local stand-in server for tests
+        self.base_url = base_url or service.base_url
+        self.cursors: Dict[Tuple[str, str], int] = {}
+        self.pages_fetched = 0
+        self.retries = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=self.max_concurrency,
+                              max_keepalive_connections=self.max_concurrency)
+        return httpx.AsyncClient(timeout=self.timeout, limits=limits)
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return max(0.0, float(retry_after))
+                except ValueError:
+                    pass
+        return self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+
+    async def _fetch_page(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                          what: str, where: str, page: int) -> Tuple[List[Dict], int]:
+        """Fetch one page; returns (transformed jobs, total result count)"""
+        url = f"{self.base_url}/{self.service.country}/search/{page}"
+        params = {
+            "app_id": self.service.app_id,
+            "app_key": self.service.app_key,
+            "results_per_page": self.results_per_page,
+            "what": what,
+            "where": where,
+            "content-type": "application/json"
+        }
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                async with semaphore:
+                    response = await client.get(url, params=params)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = response.json()
+                    self.pages_fetched += 1
+                    jobs = self.service._transform_adzuna_jobs(data.get("results", []))
+                    return jobs, int(data.get("count") or 0)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if isinstance(e, httpx.HTTPStatusError) or attempt == self.max_retries:
+                    print(f"Error fetching Adzuna page {page} for {what} in {where}: {e}")
+                    return [], 0
+            except (ValueError, AttributeError) as e:
+                # A 2xx with a body that isn't the expected JSON object; skip
+                # the page rather than failing the other pairs in the harvest
+                print(f"Malformed Adzuna page {page} for {what} in {where}: {e!r}")
+                return [], 0
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(self._retry_delay(attempt, response))
+        print(f"Giving up on Adzuna page {page} for {what} in {where} after {self.max_retries} retries")
+        return [], 0
+
+    async def _harvest_pair(self, client, semaphore, queue: asyncio.Queue, what: str, where: str,
+                            max_pages: int):
+        first_page = self.cursors.get((what, where), 1)
+        jobs, count = await self._fetch_page(client, semaphore, what, where, first_page)
+        if not jobs:
+            # Past the last page: start from the top next time
+            self.cursors[(what, where)] = 1
+            return
+        await queue.put(jobs)
+
+        total_pages = math.ceil(count / self.results_per_page) if count else first_page
+        last_page = min(total_pages, first_page + max_pages - 1)
+
+        async def fetch(page):
+            page_jobs, _ = await self._fetch_page(client, semaphore, what, where, page)
+            if page_jobs:
+                await queue.put(page_jobs)
+
+        await asyncio.gather(*(fetch(p) for p in range(first_page + 1, last_page + 1)))
+        self.cursors[(what, where)] = last_page + 1 if last_page < total_pages else 1
+
+    async def harvest(self, queries: Iterable[str], locations: Iterable[str],
+                      max_pages: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """Yield batches of transformed jobs as pages arrive"""
+        max_pages = max_pages or self.max_pages
+        pairs = [(q, l) for q in queries for l in locations]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async with self._client() as client:
+            async def run():
+                try:
+                    await asyncio.gather(*(
+                        self._harvest_pair(client, semaphore, queue, what, where, max_pages)
+                        for what, where in pairs
+                    ))
+                finally:
+                    await queue.put(done)
+
+            task = asyncio.create_task(run())
+            try:
+                while True:
+                    batch = await queue.get()
+                    if batch is done:
+                        break
+                    yield batch
+            finally:
+                if not task.done():
+                    task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def harvest_into(self, ingest_fn: Callable[[List[Dict]], Dict], queries: Iterable[str],
+                           locations: Iterable[str], max_pages: Optional[int] = None) -> Dict:
+        """Harvest and hand each batch to ingest_fn in a worker thread as it arrives"""
+        start = time.time()
+        pages_before, retries_before = self.pages_fetched, self.retries
+        fetched, ingested, updated, embedded, reused, bad_dates = 0, 0, 0, 0, 0, 0
+        async for batch in self.harvest(queries, locations, max_pages=max_pages):
+            fetched += len(batch)
+            result = await asyncio.to_thread(ingest_fn, batch)
+            ingested += result.get("ingested", 0)
+            updated += result.get("updated", 0)
+            embedded += result.get("embedded", 0)
+            reused += result.get("reused", 0)
+            bad_dates += result.get("unparseable_dates", 0)
+        return {
+            "jobs_found": fetched,
+            "jobs_ingested": ingested,
+            "jobs_updated": updated,
+            "embeddings_computed": embedded,
+            "embeddings_reused": reused,
+            "unparseable_dates": bad_dates,
+            "pages_fetched": self.pages_fetched - pages_before,
+            "retries": self.retries - retries_before,
+            "seconds": round(time.time() - start, 2),
+        }
@@ -1,17 +1,55 @@
 import requests
 import os
-from typing import List, Dict
+import re
+from typing import List, Dict, Optional
 import time
 
+from response_cache import ResponseCache
+from skills_taxonomy import skill_taxonomy
+
+# Patterns like "3+ years", "5 years experience", etc.; first match wins
+EXPERIENCE_PATTERNS = [re.compile(p) for p in (
+    r'(\d+)\+? years? experience',
+    r'experience.*?(\d+)\+? years?',
+    r'minimum.*?(\d+)\+? years?',
+    r'(\d+)\+? years? in'
+)]
+
 class AdzunaService:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         self.app_id = "b8826903"
         self.app_key = "d8cdf5bf1daa42dd0823f81043ef954d"
         self.base_url = "https://api.adzuna.com/v1/api/jobs"
         self.country = "za"  # South Africa
+        # Reuse connections across calls
+        self.session = requests.Session()
+        self.cache = cache or ResponseCache(
+            ttl=float(os.getenv("ADZUNA_CACHE_TTL", "300")),
+            stale_ttl=float(os.getenv("ADZUNA_CACHE_STALE_TTL", "3600")),
+            max_entries=int(os.getenv("ADZUNA_CACHE_MAX_ENTRIES", "512")),
+            disk_path=os.getenv("ADZUNA_CACHE_PATH") or None
+        )
+    
+    def _cache_key(self, what, where, results_per_page, page):
+        normalize = lambda v: " ".join(str(v or "").lower().split())
+        return f"{self.country}|{normalize(what)}|{normalize(where)}|{int(results_per_page)}|{int(page)}"
+    
+    def _fetch_jobs(self, url, params, etag=None):
+        """Fetch one page; returns (jobs, etag, not_modified) and raises on errors"""
+        headers = {"If-None-Match": etag} if etag else {}
+        print(f"Fetching jobs from Adzuna: {params['what']} in {params['where']}")
+        response = self.session.get(url, params=params, headers=headers, timeout=10)
+        if response.status_code == 304:
+            return None, etag, True
+        response.raise_for_status()
+        data = response.json()
+        
+        jobs = self._transform_adzuna_jobs(data.get("results", []))
+        print(f"Successfully fetched {len(jobs)} jobs")
+        return jobs, response.headers.get("ETag"), False
     
     def search_jobs(self, what="data scientist", where="johannesburg", results_per_page=20, page=1):
-        """Search jobs from Adzuna API"""
+        """Search jobs from Adzuna API, served from the response cache when possible"""
         url = f"{self.base_url}/{self.country}/search/{page}"
         
         params = {
@@ -24,14 +62,8 @@ class AdzunaService:
         }
         
         try:
-            print(f"Fetching jobs from Adzuna: {what} in {where}")
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            jobs = self._transform_adzuna_jobs(data.get("results", []))
-            print(f"Successfully fetched {len(jobs)} jobs")
-            return jobs
+            key = self._cache_key(what, where, results_per_page, page)
+            return self.cache.get_or_fetch(key, lambda etag: self._fetch_jobs(url, params, etag))
             
         except requests.exceptions.RequestException as e:
             print(f"Error fetching from Adzuna API: {e}")
@@ -45,7 +77,7 @@ class AdzunaService:
         transformed_jobs = []
         
         for job in adzuna_jobs:
-            # Extract skills from title and description using simple keyword matching
+            # Extract skills from title and description in a single pass
             description = f"{job.get('title', '')} {job.get('description', '')}".lower()
             skills = self._extract_skills(description)
             
@@ -67,74 +99,17 @@ class AdzunaService:
         return transformed_jobs
     
     def _extract_skills(self, description: str) -> List[str]:
-        """Extract skills from job description using keyword matching"""
-        skills_keywords = {
-            "python": "Python",
-            "javascript": "JavaScript",
-            "java": "Java",
-            "sql": "SQL",
-            "machine learning": "Machine Learning",
-            "data analysis": "Data Analysis",
-            "react": "React",
-            "node.js": "Node.js",
-            "aws": "AWS",
-            "docker": "Docker",
-            "kubernetes": "Kubernetes",
-            "mongodb": "MongoDB",
-            "postgresql": "PostgreSQL",
-            "mysql": "MySQL",
-            "html": "HTML",
-            "css": "CSS",
-            "typescript": "TypeScript",
-            "angular": "Angular",
-            "vue": "Vue.js",
-            "php": "PHP",
-            "c#": "C#",
-            "c++": "C++",
-            "ruby": "Ruby",
-            "go": "Go",
-            "rust": "Rust",
-            "scala": "Scala",
-            "r language": "R",
-            "tensorflow": "TensorFlow",
-            "pytorch": "PyTorch",
-            "pandas": "Pandas",
-            "numpy": "NumPy",
-            "tableau": "Tableau",
-            "power bi": "Power BI",
-            "excel": "Excel",
-            "git": "Git",
-            "jenkins": "Jenkins",
-            "linux": "Linux"
-        }
-        
-        found_skills = []
-        description_lower = description.lower()
-        
-        for keyword, skill_name in skills_keywords.items():
-            if keyword in description_lower:
-                found_skills.append(skill_name)
-        
-        # Return unique skills, limit to 8
-        return list(set(found_skills))[:8]
+        """Extract skills in order of appearance with the compiled taxonomy"""
+        return skill_taxonomy.extract(description, limit=8)
     
     def _extract_experience(self, description: str) -> int:
         """Extract years of experience from description"""
-        import re
         description_lower = description.lower()
         
-        # Look for patterns like "3+ years", "5 years experience", etc.
-        patterns = [
-            r'(\d+)\+? years? experience',
-            r'experience.*?(\d+)\+? years?',
-            r'minimum.*?(\d+)\+? years?',
-            r'(\d+)\+? years? in'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, description_lower)
-            if matches:
-                return int(matches[0])
+        for pattern in EXPERIENCE_PATTERNS:
+            match = pattern.search(description_lower)
+            if match:
+                return int(match.group(1))
         
         return 0  # Default to 0 if no experience requirement found
     
@@ -1,27 +1,69 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import json
 import os
+from collections import Counter
 from datetime import datetime, timezone
-from dateutil import parser as dateparser
 
-from curriculum_generator import curriculum_generator, CurriculumRequest, QuizSubmission, COURSES_DB, USER_PROGRESS
+from curriculum_generator import curriculum_generator, CurriculumRequest, QuizSubmission, request_key
+from course_store import course_repository, progress_store
+from generation_jobs import GenerationJob, GenerationJobStore, GenerationQueue, QueueFull
 
 # Import our Adzuna service
 from adzuna_service import adzuna_service
-
-# Try import faiss, fallback
-try:
-    import faiss
-    FAISS_AVAILABLE = True
-except Exception:
-    FAISS_AVAILABLE = False
+from adzuna_harvester import AdzunaHarvester
+from ingest_scheduler import IngestScheduler
+from reranker import JobFeatures, SCORE_COMPONENTS, WEIGHT_PROFILES, explain, rerank, weights_for
+from embedding_cache import embedding_cache
+from batch_encoder import MicroBatchEncoder
+from job_registry import JobRegistry, IndexSnapshot
+from job_filters import EXACT_FILTER_RATIO, FilterIndex, JobFilter, make_filter
+from job_store import JobStore
+from quantization import EmbeddingCodec, precision_report, rescore
+from vector_index import FAISS_AVAILABLE, IndexConfig, VectorIndex, exact_search, recall_at_k
+
+if not FAISS_AVAILABLE:
     print("FAISS not available, using brute-force search")
 
-app = FastAPI(title="Job Matching API", description="AI-powered job matching with real data from Adzuna")
+INDEX_CONFIG = IndexConfig.from_env()
+# EMBEDDING_PRECISION=float16|int8 keeps job vectors compact in memory
+EMBEDDING_CODEC = EmbeddingCodec.from_env()
+# Compact searches fetch this many times k candidates and rescore them in
+# float32; 0 returns the compact scores as they are
+RESCORE_FACTOR = int(os.getenv("EMBEDDING_RESCORE_FACTOR", "4"))
+# Set JOB_DB_PATH to an empty string to keep jobs in memory only
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_start()
+    if CURRICULUM_WARM_TOP_N:
+        warmed = warm_curriculum_cache(CURRICULUM_WARM_TOP_N)
+        print(f"Queued {len(warmed['queued'])} curricula to warm the cache")
+    # Harvest right away when there is nothing to serve yet
+    await ingest_scheduler.start(run_now=INGEST_ON_STARTUP and not len(job_registry))
+    yield
+    await ingest_scheduler.stop()
+    batch_encoder.close()
+    progress_store.close()
+    generation_queue.close()
+    if FAISS_INDEX is not None and INDEX_CONFIG.path:
+        if job_registry.buffer.tombstones:
+            # Tombstoned rows are gone from the store, so an index still
+            # holding them could never match the rows loaded at the next start
+            job_registry.compact()
+            publish_registry()
+        if save_snapshot_index(SNAPSHOT):
+            print(f"Saved {FAISS_INDEX.kind} index with {FAISS_INDEX.ntotal} vectors to {INDEX_CONFIG.path}")
+
+app = FastAPI(title="Job Matching API", description="AI-powered job matching with real data from Adzuna",
+              lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -35,37 +77,123 @@ app.add_middleware(
 MODEL_NAME = "all-MiniLM-L6-v2"
 model = SentenceTransformer(MODEL_NAME)
 
-# In-memory stores
+# In-memory stores. SNAPSHOT is swapped in one assignment after every
+# change; request handlers read it once and use that view throughout.
 JOB_STORE = []
 JOB_EMBEDDINGS = None
+JOB_FEATURES = JobFeatures()
+JOB_ALIVE = np.zeros(0, dtype=bool)
 FAISS_INDEX = None
+SNAPSHOT = IndexSnapshot(version=0, jobs=JOB_STORE, embeddings=None, features=JOB_FEATURES,
+                         alive=JOB_ALIVE, index=None, live_count=0,
+                         filters=FilterIndex(JOB_FEATURES, JOB_ALIVE),
+                         title_codes=np.zeros(0, dtype=np.int64), title_vectors=None,
+                         codec=EMBEDDING_CODEC)
 JOBS_LOADED = False
 
 # ---------- Helper Functions ----------
-def embed_texts(texts: List[str]) -> np.ndarray:
+def _encode_normalized(texts: List[str]) -> np.ndarray:
     emb = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
     emb = emb / np.linalg.norm(emb, axis=1, keepdims=True)
     return emb
 
-def build_faiss_index(embs: np.ndarray):
-    global FAISS_INDEX
-    d = embs.shape[1]
-    index = faiss.IndexFlatIP(d)
-    index.add(embs.astype(np.float32))
-    FAISS_INDEX = index
-
-def search_topk(emb: np.ndarray, k: int = 10):
-    if FAISS_AVAILABLE and FAISS_INDEX is not None:
-        D, I = FAISS_INDEX.search(np.array([emb]).astype(np.float32), k)
-        scores = D[0].tolist()
-        idxs = I[0].tolist()
-        return idxs, scores
-    else:
-        global JOB_EMBEDDINGS
-        sims = (JOB_EMBEDDINGS @ emb).tolist()
-        idxs = np.argsort(sims)[::-1][:k].tolist()
-        scores = [sims[i] for i in idxs]
+# Concurrent requests share one batched forward pass instead of encoding
+# a single sentence each
+batch_encoder = MicroBatchEncoder(
+    _encode_normalized,
+    window_ms=float(os.getenv("ENCODE_BATCH_WINDOW_MS", "5")),
+    max_batch_size=int(os.getenv("ENCODE_MAX_BATCH_SIZE", "64"))
+)
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    return embedding_cache.encode(texts, batch_encoder.encode)
+
+def embed_job_texts(texts: List[str]) -> np.ndarray:
+    """Encoder for ingested postings and their titles.
+
+    Skips embedding_cache: posting texts are mostly seen once, so they
+    would only evict the query vectors the cache is for, and the registry
+    already reuses vectors of unchanged postings by content hash. Bulk
+    batches also go straight to the model rather than through
+    batch_encoder, so interactive /match encodes never queue behind a
+    long ingest forward pass.
+    """
+    return _encode_normalized(texts)
+
+def build_faiss_index(embs: np.ndarray, decode=None):
+    return VectorIndex.build(embs, INDEX_CONFIG, decode)
+
+def search_topk(emb: np.ndarray, k: int = 10, snapshot: Optional[IndexSnapshot] = None,
+                job_filter: Optional[JobFilter] = None):
+    idxs, scores = search_topk_batch(emb, k, snapshot=snapshot, job_filter=job_filter)
+    keep = idxs[0] >= 0
+    return idxs[0][keep].tolist(), scores[0][keep].tolist()
+
+def search_topk_batch(embs: np.ndarray, k: int = 10, snapshot: Optional[IndexSnapshot] = None,
+                      job_filter: Optional[JobFilter] = None):
+    """Top-k live rows for every query in one search call.
+
+    Returns (row ids, scores) arrays with one row per query, best first,
+    padded with -1 / -inf where fewer than k rows qualify. With compact
+    embeddings a longer shortlist is rescored in float32.
+    """
+    snapshot = snapshot or SNAPSHOT
+    embs = np.atleast_2d(embs)
+    if not snapshot.codec.compact or RESCORE_FACTOR <= 1:
+        return candidate_search_batch(embs, k, snapshot, job_filter)
+    idxs, _ = candidate_search_batch(embs, k * RESCORE_FACTOR, snapshot, job_filter)
+
+    def full_vectors(rows):
+        return job_registry.full_vectors(snapshot.jobs, rows, snapshot.embeddings, snapshot.codec)
+
+    return rescore(embs, idxs, full_vectors, k)
+
+def candidate_search_batch(embs: np.ndarray, k: int, snapshot: IndexSnapshot,
+                           job_filter: Optional[JobFilter] = None):
+    """search_topk_batch without rescoring; scores come from the stored precision"""
+    if job_filter is not None:
+        return filtered_search_batch(embs, k, snapshot, job_filter)
+    alive = snapshot.alive
+    if snapshot.index is not None:
+        # Tombstoned rows stay in the index until compaction, and rows
+        # appended since the snapshot share it, so over-fetch past both
+        dead = len(alive) - snapshot.live_count
+        newer = max(0, snapshot.index.ntotal - len(alive))
+        D, I = snapshot.index.search(embs, min(k + dead, len(alive)) + newer)
+        # Rows added after the snapshot was taken are out of range
+        keep = (I >= 0) & (I < len(alive))
+        keep[keep] = alive[I[keep]]
+        # Shift the kept hits of every query to the front, in score order
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :k]
+        idxs = np.take_along_axis(I, order, axis=1)
+        scores = np.take_along_axis(D, order, axis=1)
+        kept = np.take_along_axis(keep, order, axis=1)
+        idxs[~kept] = -1
+        scores[~kept] = -np.inf
         return idxs, scores
+    D, I = exact_search(snapshot.embeddings, embs, k, mask=alive, codec=snapshot.codec)
+    return I, D
+
+def filtered_search_batch(embs: np.ndarray, k: int, snapshot: IndexSnapshot, job_filter: JobFilter):
+    """Top-k among the rows passing job_filter, filtering before scoring.
+
+    Broad filters go to the vector index with the filter bitmap as an id
+    selector; narrow ones gather the passing rows and score them exactly,
+    which is both faster and exact once few rows qualify.
+    """
+    bitmap, selected = snapshot.filters.bitmap(job_filter)
+    k = min(k, selected)
+    if k == 0:
+        return np.empty((len(embs), 0), dtype=np.int64), np.empty((len(embs), 0), dtype=np.float32)
+    if snapshot.index is not None and selected >= EXACT_FILTER_RATIO * len(snapshot.alive):
+        # The bitmap only covers snapshot rows, so later appends can't leak in
+        D, I = snapshot.index.search(embs, k, bitmap=bitmap)
+        if (I >= 0).all():
+            return I, D
+        # IVF probes or the HNSW beam missed some passing rows; fall through
+    rows = np.flatnonzero(snapshot.filters.unpack(bitmap))
+    D, I = exact_search(snapshot.embeddings[rows], embs, k, codec=snapshot.codec)
+    return np.where(I >= 0, rows[np.maximum(I, 0)], -1), D
 
 def combine_job_text(j: dict) -> str:
     components = [
@@ -77,22 +205,57 @@ def combine_job_text(j: dict) -> str:
     ]
     return " ".join(c for c in components if c)
 
-def parse_posted_date(d: Any) -> Optional[datetime]:
-    """Parse posted date and return timezone-naive datetime"""
-    if not d:
-        return None
-    try:
-        if isinstance(d, (int, float)):
-            return datetime.utcfromtimestamp(int(d))
-        if isinstance(d, str):
-            parsed = dateparser.parse(d)
-            if parsed and parsed.tzinfo is not None:
-                # Convert to naive datetime by removing timezone info
-                parsed = parsed.replace(tzinfo=None)
-            return parsed
-    except Exception as e:
-        print(f"Error parsing date {d}: {e}")
+# Primary-key registry that owns the rows behind JOB_STORE, JOB_EMBEDDINGS,
+# JOB_FEATURES and FAISS_INDEX
+job_registry = JobRegistry(
+    embed_fn=embed_job_texts,
+    text_fn=combine_job_text,
+    index_factory=build_faiss_index if FAISS_AVAILABLE else None,
+    store=JobStore(JOB_DB_PATH) if JOB_DB_PATH else None,
+    codec=EMBEDDING_CODEC,
+    # Title vectors are only needed when some profile weights titles
+    encode_titles=any(weights["title"] for weights in WEIGHT_PROFILES.values())
+)
+
+def publish_registry():
+    """Atomically publish a snapshot of the registry's current state"""
+    global SNAPSHOT, JOB_STORE, JOB_EMBEDDINGS, JOB_FEATURES, JOB_ALIVE, FAISS_INDEX
+    snapshot = job_registry.snapshot()
+    SNAPSHOT = snapshot
+    JOB_STORE = snapshot.jobs
+    JOB_EMBEDDINGS = snapshot.embeddings
+    JOB_FEATURES = snapshot.features
+    JOB_ALIVE = snapshot.alive
+    FAISS_INDEX = snapshot.index
+
+def save_snapshot_index(snapshot: IndexSnapshot) -> bool:
+    """Save the snapshot's index if the next start would load the same rows in the same order"""
+    # The jobs list may have grown since the snapshot; fingerprint the indexed rows only
+    rows = snapshot.jobs[:snapshot.index.ntotal]
+    store = job_registry.store
+    if store is not None and [job["id"] for job in rows] != store.job_ids():
+        # e.g. tombstoned rows, or an update that kept its stored vector row
+        print("Not saving the vector index: its rows don't line up with the job store, "
+              "so it would be rebuilt on load anyway")
+        return False
+    snapshot.index.save(INDEX_CONFIG.path, fingerprint=job_registry.fingerprint(rows))
+    return True
+
+def load_saved_index(embs: np.ndarray, jobs: List[dict]):
+    if not FAISS_AVAILABLE or not INDEX_CONFIG.path:
         return None
+    return VectorIndex.load(INDEX_CONFIG.path, INDEX_CONFIG, fingerprint=job_registry.fingerprint())
+
+def warm_start():
+    """Serve the persisted jobs without re-fetching or re-embedding them"""
+    global JOBS_LOADED
+    start = datetime.now()
+    loaded = job_registry.load_from_store(index_loader=load_saved_index)
+    publish_registry()
+    if loaded:
+        JOBS_LOADED = True
+        elapsed = (datetime.now() - start).total_seconds()
+        print(f"Loaded {loaded} jobs from {JOB_DB_PATH} in {elapsed:.1f}s")
 
 # ---------- Pydantic Models ----------
 class JobIn(BaseModel):
@@ -113,99 +276,278 @@ class UserProfile(BaseModel):
     location: Optional[str] = ""
     yearsExperience: Optional[int] = 0
     top_k: Optional[int] = 10
+    # Hard filters, applied before vector search
+    remoteOnly: Optional[bool] = False
+    locations: Optional[List[str]] = None
+    withinExperience: Optional[bool] = False
+    postedWithinDays: Optional[int] = None
+    # Named weight profile from scoring_profiles.json; server default if unset
+    scoringProfile: Optional[str] = None
+
+def profile_filter(user: UserProfile) -> Optional[JobFilter]:
+    """Structured filter requested by a profile, None if unfiltered"""
+    return make_filter(
+        remote=True if user.remoteOnly else None,
+        locations=user.locations,
+        max_years=(user.yearsExperience or 0) if user.withinExperience else None,
+        posted_within_days=user.postedWithinDays
+    )
 
 class SearchQuery(BaseModel):
     query: str = "data scientist"
     location: str = "johannesburg"
     max_results: int = 20
 
+class HarvestRequest(BaseModel):
+    queries: List[str] = ["data scientist"]
+    locations: List[str] = ["johannesburg"]
+    max_pages: int = 5
+
 # ---------- Endpoints ----------
 @app.get("/")
 def read_root():
     return {
         "message": "Job Matching API with Adzuna Integration", 
         "status": "running",
-        "jobs_loaded": len(JOB_STORE),
+        "jobs_loaded": len(job_registry),
         "adzuna_ready": True
     }
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "jobs_loaded": len(JOB_STORE)}
+    return {"status": "healthy", "jobs_loaded": len(job_registry), "store": job_registry.stats()}
+
+@app.get("/stats/embedding-cache")
+def embedding_cache_stats():
+    """Hit/miss counters and memory use of the shared embedding cache"""
+    return embedding_cache.stats()
+
+@app.get("/stats/encoder")
+def encoder_stats():
+    """Batch sizes achieved by the micro-batching encoder"""
+    return batch_encoder.stats()
+
+@app.get("/stats/adzuna-cache")
+def adzuna_cache_stats():
+    """Hit/stale/miss counters for the Adzuna response cache"""
+    return adzuna_service.cache.stats()
+
+
+@app.get("/stats/learning")
+def learning_stats():
+    """Course cache, progress write-behind and generation queue statistics"""
+    return {"courses": course_repository.stats(), "progress": progress_store.stats(),
+            "generation": generation_queue.stats(), "curriculum_cache": curriculum_generator.cache.stats()}
+
+@app.get("/index/stats")
+def index_stats():
+    """Type and size of the vector index"""
+    stats = {"kind": "numpy", "ntotal": len(JOB_ALIVE)} if FAISS_INDEX is None else FAISS_INDEX.describe()
+    return {**stats, "filters": SNAPSHOT.filters.stats()}
+
+@app.get("/index/recall")
+def index_recall(k: int = 10, queries: int = 100, nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None):
+    """Recall@k of the vector index against exact search, for tuning nprobe/efSearch"""
+    if FAISS_INDEX is None or JOB_EMBEDDINGS is None:
+        raise HTTPException(status_code=400, detail="No vector index built")
+    rng = np.random.default_rng()
+    codec = SNAPSHOT.codec
+    sample = JOB_EMBEDDINGS[rng.choice(len(JOB_EMBEDDINGS), min(queries, len(JOB_EMBEDDINGS)), replace=False)]
+    return recall_at_k(FAISS_INDEX, JOB_EMBEDDINGS, codec.decode(sample), k=k, nprobe=nprobe,
+                       ef_search=ef_search, codec=codec)
+
+@app.get("/index/precision-report")
+def index_precision_report(k: int = 10, queries: int = 100, rows: int = 100000, rescore_factor: int = 4):
+    """Recall@k and latency of float16 / int8 search against float32 on a sample of the corpus"""
+    snapshot = SNAPSHOT
+    store = job_registry.store
+    embs = snapshot.embeddings if not snapshot.codec.compact else (store.open_matrix() if store else None)
+    if embs is None or not len(embs):
+        raise HTTPException(status_code=400, detail="No float32 embeddings to sample")
+    rng = np.random.default_rng()
+    sample = np.asarray(embs[np.sort(rng.choice(len(embs), min(rows, len(embs)), replace=False))],
+                        dtype=np.float32)
+    query_rows = sample[rng.choice(len(sample), min(queries, len(sample)), replace=False)]
+    return precision_report(sample, query_rows, k=k, rescore_factor=rescore_factor)
+
+@app.post("/index/save")
+def save_index():
+    """Write the vector index to VECTOR_INDEX_PATH"""
+    if FAISS_INDEX is None or not INDEX_CONFIG.path:
+        raise HTTPException(status_code=400, detail="No vector index or VECTOR_INDEX_PATH not set")
+    snapshot = SNAPSHOT
+    if not save_snapshot_index(snapshot):
+        raise HTTPException(status_code=409, detail="Index rows don't line up with the job store; "
+                                                    "a saved copy would be rebuilt on load")
+    return {"saved": INDEX_CONFIG.path, "ntotal": snapshot.index.ntotal}
+
+def generate_and_store(request: CurriculumRequest, report=None) -> str:
+    """Generate and store a course; outline and finished stages go to report"""
+    course = None
+    for event in curriculum_generator.generate_stages(request):
+        if event["event"] == "course":
+            course = event["course"]
+        elif report is not None:
+            report(event)
+    course_repository.put(course)
+    return course['id']
+
+# Generation runs on worker threads; the event loop only queues and polls
+generation_queue = GenerationQueue(generate_and_store, request_key, store=GenerationJobStore())
+# How often a streaming response checks its job for new events, in seconds
+GENERATION_STREAM_POLL = 0.1
+# Warm the curriculum cache for this many of the corpus' top skills on startup
+CURRICULUM_WARM_TOP_N = int(os.getenv("CURRICULUM_WARM_TOP_N", "0"))
+
+def top_required_skills(n: int, snapshot: Optional[IndexSnapshot] = None) -> List[str]:
+    """Most common requiredSkills among live jobs"""
+    snapshot = snapshot or SNAPSHOT
+    counts = Counter()
+    for row in np.flatnonzero(snapshot.alive):
+        counts.update(set(snapshot.jobs[row].get("requiredSkills") or []))
+    return [skill for skill, _ in counts.most_common(n)]
+
+def warm_curriculum_cache(top_n: int) -> Dict:
+    """Queue generation for top skills whose default curriculum isn't cached.
+
+    Stops early when the queue is full, so warming never crowds out
+    learners' own requests.
+    """
+    if not curriculum_generator.model_loaded:
+        return {"queued": [], "cached": [], "skipped": []}
+    queued, cached, skipped = [], [], []
+    for skill in top_required_skills(top_n):
+        request = CurriculumRequest(skill=skill)
+        if curriculum_generator.is_cached(request):
+            cached.append(skill)
+            continue
+        try:
+            job, _ = generation_queue.submit(request)
+        except QueueFull:
+            skipped.append(skill)
+            continue
+        queued.append({"skill": skill, "job_id": job.id})
+    return {"queued": queued, "cached": cached, "skipped": skipped}
 
+def generation_response(job: GenerationJob):
+    """Job status, plus the course once it is ready"""
+    response = {"success": job.status != "failed", **job.describe()}
+    if job.status == "done":
+        response["course_id"] = job.result
+        response["course"] = course_repository.get(job.result)
+    return response
 
 @app.post("/generate-curriculum")
-async def generate_curriculum(request: CurriculumRequest):
-    """Generate a learning curriculum for a skill"""
+async def generate_curriculum(request: CurriculumRequest, wait: bool = False, timeout: float = 120):
+    """Queue curriculum generation for a skill and return its job id.
+
+    Poll /generate-curriculum/jobs/{job_id}; with wait=true the response is
+    held until the course is ready or `timeout` seconds pass.
+    """
     try:
-        course = curriculum_generator.generate_course(request)
-        COURSES_DB[course['id']] = course
-        
-        # Initialize empty progress for this course
-        USER_PROGRESS[course['id']] = {}
-        
-        return {
-            "success": True,
-            "course_id": course['id'],
-            "course": course
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate curriculum: {str(e)}")
+        job, created = generation_queue.submit(request)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if wait:
+        await generation_queue.wait(job, timeout)
+    return {**generation_response(job), "deduplicated": not created}
+
+async def generation_events(job: GenerationJob, first: Dict):
+    """NDJSON lines: first, each event the job reports, then its final status"""
+    yield json.dumps(first) + "\n"
+    sent = 0
+    while True:
+        finished = job.done
+        events = job.events[sent:]
+        for event in events:
+            yield json.dumps(event) + "\n"
+        sent += len(events)
+        if finished:
+            break
+        await generation_queue.wait(job, GENERATION_STREAM_POLL)
+    final = {"event": job.status, **job.describe()}
+    if job.status == "done":
+        final["course_id"] = job.result
+    yield json.dumps(final) + "\n"
+
+@app.post("/generate-curriculum/stream")
+async def stream_curriculum(request: CurriculumRequest):
+    """Queue generation and stream its progress as NDJSON.
+
+    Lines arrive as the course is written: the job status, the outline,
+    one "stage" line per finished stage with its lessons, and finally a
+    "done" line with the course id (or "failed" with the error).
+    """
+    try:
+        job, created = generation_queue.submit(request)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    first = {"event": "queued", **job.describe(), "deduplicated": not created}
+    return StreamingResponse(generation_events(job, first), media_type="application/x-ndjson")
+
+@app.post("/generate-curriculum/warm")
+def warm_curricula(top_n: int = 10):
+    """Pre-generate curricula for the top_n skills most requested by jobs"""
+    return warm_curriculum_cache(top_n)
+
+@app.get("/generate-curriculum/jobs/{job_id}")
+def get_generation_job(job_id: str):
+    """Status of a generation job; includes the course when done"""
+    job = generation_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return generation_response(job)
+
+@app.get("/generate-curriculum/jobs/{job_id}/wait")
+async def wait_generation_job(job_id: str, timeout: float = 30):
+    """Long-poll: respond when the job finishes or after `timeout` seconds"""
+    job = generation_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return generation_response(await generation_queue.wait(job, timeout))
+
+@app.get("/generate-curriculum/jobs/{job_id}/stream")
+async def stream_generation_job(job_id: str):
+    """Stream an existing job's progress; events reported so far are replayed first"""
+    job = generation_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return StreamingResponse(generation_events(job, {"event": "status", **job.describe()}),
+                             media_type="application/x-ndjson")
 
 @app.get("/course/{course_id}")
-async def get_course(course_id: str):
+def get_course(course_id: str):
     """Get a generated course by ID"""
-    course = COURSES_DB.get(course_id)
+    course = course_repository.get(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     return course
 
 @app.get("/course/{course_id}/lesson/{lesson_id}")
-async def get_lesson(course_id: str, lesson_id: str):
+def get_lesson(course_id: str, lesson_id: str):
     """Get a specific lesson without revealing quiz answers"""
-    course = COURSES_DB.get(course_id)
-    if not course:
+    if course_id not in course_repository:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    # Find the lesson
-    lesson = None
-    for stage in course['stages']:
-        for module in stage['modules']:
-            for l in module['lessons']:
-                if l['id'] == lesson_id:
-                    lesson = l.copy()  # Create a copy to modify
-                    break
-    
+    lesson = course_repository.lesson(course_id, lesson_id)
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
     
-    # Remove correct answers before sending to client
-    if 'quiz' in lesson and 'questions' in lesson['quiz']:
-        for question in lesson['quiz']['questions']:
-            if 'correct_index' in question:
-                del question['correct_index']
-    
-    return lesson
+    # Precomputed copy with the quiz answers removed
+    return lesson.public
 
 @app.post("/submit-quiz")
-async def submit_quiz(submission: QuizSubmission):
+def submit_quiz(submission: QuizSubmission):
     """Submit quiz answers and check results"""
-    course = COURSES_DB.get(submission.course_id)
-    if not course:
+    if submission.course_id not in course_repository:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    # Find the lesson and its correct answers
-    correct_answers = {}
-    lesson_passing_score = 70
-    
-    for stage in course['stages']:
-        for module in stage['modules']:
-            for lesson in module['lessons']:
-                if lesson['id'] == submission.lesson_id:
-                    lesson_passing_score = lesson['quiz'].get('passing_score', 70)
-                    for question in lesson['quiz']['questions']:
-                        correct_answers[question['id']] = question.get('correct_index', 0)
-                    break
+    lesson = course_repository.lesson(submission.course_id, submission.lesson_id)
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    correct_answers = lesson.answer_key
+    lesson_passing_score = lesson.passing_score
     
     # Calculate score
     correct_count = 0
@@ -221,15 +563,8 @@ async def submit_quiz(submission: QuizSubmission):
     passed = score_percentage >= lesson_passing_score
     
     # Store progress
-    user_key = f"{submission.user_id}_{submission.course_id}"
-    if user_key not in USER_PROGRESS:
-        USER_PROGRESS[user_key] = {}
-    
-    USER_PROGRESS[user_key][submission.lesson_id] = {
-        "score": score_percentage,
-        "passed": passed,
-        "completed_at": datetime.utcnow().isoformat()
-    }
+    progress_store.record(submission.user_id, submission.course_id, submission.lesson_id,
+                          score_percentage, passed)
     
     return {
         "score": round(score_percentage, 1),
@@ -239,16 +574,24 @@ async def submit_quiz(submission: QuizSubmission):
     }
 
 @app.get("/user/{user_id}/progress/{course_id}")
-async def get_user_progress(user_id: str, course_id: str):
+def get_user_progress(user_id: str, course_id: str):
     """Get user progress for a course"""
-    user_key = f"{user_id}_{course_id}"
-    progress = USER_PROGRESS.get(user_key, {})
-    return {"progress": progress}
+    return {"progress": progress_store.progress(user_id, course_id)}
+
+@app.get("/user/{user_id}/progress")
+def get_user_progress_all(user_id: str):
+    """Get user progress across all courses, keyed by course id"""
+    return {"progress": progress_store.user_progress(user_id)}
+
+@app.get("/course/{course_id}/progress")
+def get_course_progress(course_id: str):
+    """Progress of every user in a course, keyed by user id"""
+    return {"progress": progress_store.course_progress(course_id)}
 
 @app.post("/search/adzuna")
 def search_adzuna_jobs(search: SearchQuery):
     """Search for jobs on Adzuna and add them to our database"""
-    global JOB_STORE, JOB_EMBEDDINGS, FAISS_INDEX, JOBS_LOADED
+    global JOBS_LOADED
     
     print(f"Searching Adzuna for: {search.query} in {search.location}")
     
@@ -277,6 +620,55 @@ def search_adzuna_jobs(search: SearchQuery):
         "jobs_ingested": result['ingested']
     }
 
+adzuna_harvester = AdzunaHarvester(
+    max_concurrency=int(os.getenv("ADZUNA_MAX_CONCURRENCY", "8")),
+    results_per_page=int(os.getenv("ADZUNA_RESULTS_PER_PAGE", "50")),
+    max_pages=int(os.getenv("ADZUNA_MAX_PAGES", "5"))
+)
+
+def ingest_job_dicts(jobs_data: List[dict]):
+    """Validate raw job dicts (e.g. from Adzuna) and ingest them"""
+    return ingest_jobs_internal([JobIn(**job_data) for job_data in jobs_data])
+
+def _env_list(name: str, default: str) -> List[str]:
+    return [v.strip() for v in os.getenv(name, default).split(",") if v.strip()]
+
+INGEST_ON_STARTUP = os.getenv("INGEST_ON_STARTUP", "true").lower() == "true"
+
+ingest_scheduler = IngestScheduler(
+    adzuna_harvester,
+    ingest_job_dicts,
+    queries=_env_list("INGEST_QUERIES", "software developer,data scientist"),
+    locations=_env_list("INGEST_LOCATIONS", "south africa"),
+    interval_seconds=float(os.getenv("INGEST_INTERVAL_MINUTES", "60")) * 60
+)
+
+@app.get("/ingest/status")
+def ingest_status():
+    """Queue depth, last-run timings and staleness of background ingestion"""
+    return {**ingest_scheduler.status(), "jobs_loaded": SNAPSHOT.live_count,
+            "snapshot_version": SNAPSHOT.version}
+
+@app.post("/ingest/trigger")
+def trigger_ingest(harvest: Optional[HarvestRequest] = None):
+    """Queue an on-demand background harvest"""
+    queued = ingest_scheduler.trigger(
+        harvest.queries if harvest else None,
+        harvest.locations if harvest else None
+    )
+    return {"queued": queued, "queue_depth": ingest_scheduler.status()["queue_depth"]}
+
+@app.post("/harvest/adzuna")
+async def harvest_adzuna(harvest: HarvestRequest):
+    """Fetch many pages for every query/location pair concurrently and ingest as they arrive"""
+    global JOBS_LOADED
+    result = await adzuna_harvester.harvest_into(
+        ingest_job_dicts, harvest.queries, harvest.locations, max_pages=harvest.max_pages
+    )
+    if result["jobs_ingested"]:
+        JOBS_LOADED = True
+    return result
+
 @app.post("/ingest")
 def ingest_jobs(jobs: List[JobIn]):
     """Ingest jobs provided in the request"""
@@ -287,98 +679,179 @@ def ingest_jobs(jobs: List[JobIn]):
 
 def ingest_jobs_internal(jobs: List[JobIn]):
     """Internal function to ingest jobs"""
-    global JOB_STORE, JOB_EMBEDDINGS, FAISS_INDEX
-    
-    new_texts = []
-    new_jobs = []
-    
-    for j in jobs:
-        j_dict = j.dict()
-        if any(existing["id"] == j_dict["id"] for existing in JOB_STORE):
-            continue
-        new_jobs.append(j_dict)
-        new_texts.append(combine_job_text(j_dict))
-
-    if not new_jobs:
-        return {"ingested": 0}
-
-    new_embs = embed_texts(new_texts)
-    JOB_STORE.extend(new_jobs)
-    
-    if JOB_EMBEDDINGS is None:
-        JOB_EMBEDDINGS = new_embs
-    else:
-        JOB_EMBEDDINGS = np.vstack([JOB_EMBEDDINGS, new_embs])
-
-    if FAISS_AVAILABLE:
-        if FAISS_INDEX is None:
-            build_faiss_index(JOB_EMBEDDINGS)
-        else:
-            FAISS_INDEX.add(new_embs.astype(np.float32))
+    result = job_registry.upsert(j.dict() for j in jobs)
+    publish_registry()
+    return result
 
-    return {"ingested": len(new_jobs)}
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """Remove a job from the store and the search index"""
+    deleted = job_registry.delete([job_id])
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Job not found")
+    publish_registry()
+    return {"deleted": deleted}
+
+@app.post("/jobs/expire")
+def expire_jobs(max_age_days: float = 60):
+    """Drop postings older than max_age_days"""
+    expired = job_registry.expire(max_age_days)
+    if expired:
+        publish_registry()
+    return {"expired": expired, "jobs_loaded": len(job_registry)}
+
+def profile_weights(user: UserProfile):
+    try:
+        return weights_for(user.scoringProfile)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+TITLE_GATHER_ELEMENTS = 4_000_000
+
+def title_similarities(snapshot: IndexSnapshot, users: List[UserProfile], idxs: np.ndarray,
+                       bulk: bool = False) -> np.ndarray:
+    """Cosine similarity of each user's desired roles to their candidates' titles.
+
+    Titles come from the snapshot's precomputed title matrix, so only the
+    role texts are encoded: through the micro-batcher like other query
+    encodes, or straight to the model for bulk batches. NaN for users
+    without desired roles.
+    """
+    idxs = np.atleast_2d(idxs)
+    sims = np.full(idxs.shape, np.nan)
+    with_roles = [i for i, u in enumerate(users) if u.desiredRoles]
+    if not with_roles or snapshot.title_vectors is None:
+        return sims
+    roles = embedding_cache.encode([" ".join(users[i].desiredRoles) for i in with_roles],
+                                   _encode_normalized if bulk else batch_encoder.encode)
+    codes = snapshot.title_codes[idxs[with_roles]]
+    # Gather title vectors a block of users at a time to bound memory
+    step = max(1, TITLE_GATHER_ELEMENTS // max(1, codes.shape[1] * roles.shape[1]))
+    for start in range(0, len(with_roles), step):
+        titles = snapshot.title_vectors[codes[start:start + step]]
+        sims[with_roles[start:start + step]] = np.einsum("ukd,ud->uk", titles, roles[start:start + step])
+    return sims
+
+@app.get("/scoring/profiles")
+def scoring_profiles():
+    """Configured weight profiles"""
+    return WEIGHT_PROFILES
 
 @app.post("/match")
-def match(user: UserProfile):
+def match(user: UserProfile, explain_scores: bool = False):
     """Match user profile against available jobs"""
-    if not JOB_STORE:
-        # If no jobs loaded, automatically fetch some from Adzuna
-        print("No jobs in database, fetching from Adzuna...")
-        search_result = search_adzuna_jobs(SearchQuery(
-            query=" ".join(user.desiredRoles or ["software"]),
-            location=user.location or "south africa",
-            max_results=user.top_k or 20
-        ))
-        
-        if not JOB_STORE:
-            return get_sample_matches()
-    
-    user_text = " ".join(user.skills + (user.desiredRoles or []) + ([user.location] if user.location else []))
-    user_emb = embed_texts([user_text])[0]
+    weights = profile_weights(user)
+    snapshot = SNAPSHOT
+    if not snapshot.live_count:
+        # Fetch in the background; this request gets sample data rather than
+        # waiting on Adzuna and the encoder
+        ingest_scheduler.trigger(
+            [" ".join(user.desiredRoles or ["software"])],
+            [user.location or "south africa"]
+        )
+        return get_sample_matches()
     
-    k = min(user.top_k or 10, len(JOB_STORE))
-    idxs, sim_scores = search_topk(user_emb, k=k)
+    user_emb = embed_texts([profile_text(user)])[0]
     
-    results = []
-    for idx, base_sim in zip(idxs, sim_scores):
-        job = JOB_STORE[idx]
-        
-        # Calculate match score
-        skill_sim = (base_sim + 1) / 2
-        
-        # Experience score
-        min_exp = job.get("minYearsExperience") or 0
-        exp_score = min(1.0, (user.yearsExperience or 0) / min_exp) if min_exp > 0 else 1.0
-        
-        # Location score
-        loc_score = 1.0 if job.get("remote", False) or (user.location and user.location.lower() in (job.get("location") or "").lower()) else 0.0
-        
-        # Recency score - FIXED: Use naive datetime for both
-        posted = parse_posted_date(job.get("postedDate"))
-        days_ago = (datetime.utcnow() - posted).days if posted else 30
-        recency_score = np.exp(-days_ago / 30.0)
-        
-        # Weighted overall score
-        weights = {"skill": 0.55, "exp": 0.20, "loc": 0.20, "recency": 0.05}
-        overall = (weights["skill"] * skill_sim + 
-                  weights["exp"] * exp_score + 
-                  weights["loc"] * loc_score + 
-                  weights["recency"] * recency_score)
-        
-        match_percent = round(max(0, min(100, overall * 100)), 1)
-        
-        results.append({
-            "job": job,
-            "matchPercent": match_percent,
-            "breakdown": {
-                "skill": round(skill_sim * 100, 1),
-                "experience": round(exp_score * 100, 1),
-                "location": round(loc_score * 100, 1),
-                "recency": round(recency_score * 100, 1)
-            }
-        })
+    k = min(user.top_k or 10, snapshot.live_count)
+    idxs, sim_scores = search_topk(user_emb, k=k, snapshot=snapshot, job_filter=profile_filter(user))
+    idxs = np.asarray(idxs, dtype=np.int64)
     
-    return {"results": sorted(results, key=lambda x: x["matchPercent"], reverse=True)}
+    title_sims = title_similarities(snapshot, [user], idxs)[0] if weights["title"] else None
+    scores = rerank(snapshot.features, np.asarray(sim_scores), user_location=user.location,
+                    years_experience=user.yearsExperience, idxs=idxs, weights=weights,
+                    title_sims=title_sims)
+    match_percent = np.round(np.clip(scores["overall"] * 100, 0, 100), 1)
+
+    results = [
+        match_result(snapshot.jobs[idxs[pos]], match_percent, scores, pos, weights, explain_scores)
+        for pos in np.argsort(-match_percent, kind="stable")
+    ]
+    return {"results": results}
+
+def profile_text(user: UserProfile) -> str:
+    return " ".join(user.skills + (user.desiredRoles or []) + ([user.location] if user.location else []))
+
+def match_result(job: dict, match_percent: np.ndarray, scores: Dict[str, np.ndarray], pos,
+                 weights: Dict[str, float], explain_scores: bool = False):
+    """Response entry for the candidate at `pos` (an index into the score arrays).
+
+    The breakdown lists the components the profile gives weight to;
+    explain_scores adds each component's weight and contribution.
+    """
+    result = {
+        "job": job,
+        "matchPercent": float(match_percent[pos]),
+        "breakdown": {
+            c: round(float(scores[c][pos]) * 100, 1) for c in SCORE_COMPONENTS if weights[c]
+        }
+    }
+    if explain_scores:
+        result["explain"] = explain(scores, weights, pos)
+    return result
+
+MATCH_BATCH_SIZE = int(os.getenv("MATCH_BATCH_SIZE", "1024"))
+
+def match_batch(users: List[UserProfile], snapshot: Optional[IndexSnapshot] = None,
+                batch_size: int = MATCH_BATCH_SIZE, explain_scores: bool = False) -> Iterator[Dict]:
+    """Match many profiles, yielding {"index", "results"} per profile in input order.
+
+    Works through batch_size profiles at a time: one encoder call for the
+    batch, one multi-query search per distinct filter, and one rerank over
+    the whole users x candidates matrix.
+    """
+    snapshot = snapshot or SNAPSHOT
+    # Reject unknown profiles before streaming starts
+    weights = [weights_for(u.scoringProfile) for u in users]
+    for start in range(0, len(users), batch_size):
+        chunk = users[start:start + batch_size]
+        chunk_weights = weights[start:start + batch_size]
+        if not snapshot.live_count:
+            for i in range(len(chunk)):
+                yield {"index": start + i, "results": []}
+            continue
+
+        # Bulk batches are already large, so skip the micro-batching queue
+        embs = embedding_cache.encode([profile_text(u) for u in chunk], _encode_normalized)
+        ks = np.array([min(u.top_k or 10, snapshot.live_count) for u in chunk])
+        k = int(ks.max())
+        idxs = np.full((len(chunk), k), -1, dtype=np.int64)
+        sims = np.zeros((len(chunk), k), dtype=np.float32)
+
+        groups: Dict[Optional[JobFilter], List[int]] = {}
+        for i, user in enumerate(chunk):
+            groups.setdefault(profile_filter(user), []).append(i)
+        for job_filter, members in groups.items():
+            I, D = search_topk_batch(embs[members], k, snapshot=snapshot, job_filter=job_filter)
+            idxs[members, :I.shape[1]] = I
+            sims[members, :D.shape[1]] = np.where(I >= 0, D, 0)
+
+        valid = (idxs >= 0) & (np.arange(k) < ks[:, None])
+        idxs = np.where(valid, idxs, 0)
+        title_sims = None
+        if any(w["title"] for w in chunk_weights):
+            title_sims = title_similarities(snapshot, chunk, idxs, bulk=True)
+        scores = rerank(snapshot.features, sims, user_location=[u.location for u in chunk],
+                        years_experience=[u.yearsExperience for u in chunk],
+                        idxs=idxs, weights=chunk_weights, title_sims=title_sims)
+        match_percent = np.round(np.clip(scores["overall"] * 100, 0, 100), 1)
+        order = np.argsort(np.where(valid, -match_percent, np.inf), axis=1, kind="stable")
+
+        for i in range(len(chunk)):
+            results = [
+                match_result(snapshot.jobs[idxs[i, j]], match_percent, scores, (i, j),
+                             chunk_weights[i], explain_scores)
+                for j in order[i, :valid[i].sum()]
+            ]
+            yield {"index": start + i, "results": results}
+
+@app.post("/match/batch")
+def match_batch_endpoint(users: List[UserProfile], explain_scores: bool = False):
+    """Match many profiles at once; one NDJSON line per profile, in input order"""
+    for user in users:
+        profile_weights(user)
+    lines = (json.dumps(result) + "\n" for result in match_batch(users, SNAPSHOT, explain_scores=explain_scores))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 def get_sample_matches():
     """Fallback sample data"""
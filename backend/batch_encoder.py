@@ -0,0 +1,117 @@
+# backend/batch_encoder.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+
+class MicroBatchEncoder:
+    """Collects concurrent encode calls into a single batched forward pass.
+
+    Callers submit texts from any thread and block on a future. A single
+    worker thread waits up to `window_ms` for more requests to arrive, encodes
+    everything it collected at once, and hands each caller its slice.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 window_ms: float = 5.0, max_batch_size: int = 64):
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="micro-batch-encoder", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return future
+        self._ensure_started()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _collect(self, first):
+        batch = [first]
+        count = len(first[0])
+        deadline = time.monotonic() + self.window
+        while count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped = True
+                break
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    def _run(self):
+        while not self._stopped:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = self._collect(item)
+            texts = [t for texts, _ in batch for t in texts]
+            try:
+                embs = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            start = 0
+            for texts_i, future in batch:
+                future.set_result(embs[start:start + len(texts_i)])
+                start += len(texts_i)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+        # Fail anything submitted after the worker stopped
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Encoder is closed"))
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
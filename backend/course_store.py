@@ -0,0 +1,358 @@
+# backend/course_store.py
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from job_store import PRAGMAS
+
+DEFAULT_PASSING_SCORE = 70
+# Set COURSE_DB_PATH to an empty string for a throwaway database that is
+# deleted when the process exits
+COURSE_DB_PATH = os.getenv("COURSE_DB_PATH", "courses.db")
+# Courses whose parsed JSON and lesson index stay in memory
+COURSE_CACHE_SIZE = int(os.getenv("COURSE_CACHE_SIZE", "256"))
+# Buffer progress writes for this long and write them in one transaction; 0
+# writes every submission straight through
+PROGRESS_WRITE_BEHIND_MS = float(os.getenv("PROGRESS_WRITE_BEHIND_MS", "0"))
+# Flush early once this many submissions are waiting
+PROGRESS_MAX_PENDING = 1000
+
+# Where a lesson sits in its course, plus what reads and grading need:
+#   public: copy of the lesson with correct_index stripped from every question
+#   answer_key: question id -> correct option index
+LessonRecord = namedtuple("LessonRecord", ["stage", "module", "position", "public", "answer_key", "passing_score"])
+
+def public_lesson(lesson: Dict) -> Dict:
+    """Deep copy of a lesson that is safe to send to learners"""
+    public = copy.deepcopy(lesson)
+    for question in (public.get('quiz') or {}).get('questions', []):
+        question.pop('correct_index', None)
+    return public
+
+
+def answer_key(lesson: Dict) -> Dict[str, int]:
+    return {
+        question['id']: question.get('correct_index', 0)
+        for question in (lesson.get('quiz') or {}).get('questions', [])
+        if 'id' in question
+    }
+
+
+def index_lessons(course: Dict) -> Dict[str, LessonRecord]:
+    """lesson id -> LessonRecord; if a course repeats a lesson id the first one wins"""
+    lessons = {}
+    for s, stage in enumerate(course.get('stages', [])):
+        for m, module in enumerate(stage.get('modules', [])):
+            for position, lesson in enumerate(module.get('lessons', [])):
+                if lesson.get('id') in lessons:
+                    continue
+                lessons[lesson.get('id')] = LessonRecord(
+                    stage=s,
+                    module=m,
+                    position=position,
+                    public=public_lesson(lesson),
+                    answer_key=answer_key(lesson),
+                    passing_score=(lesson.get('quiz') or {}).get('passing_score', DEFAULT_PASSING_SCORE)
+                )
+    return lessons
+
+
+class SQLiteDatabase:
+    """Per-thread pooled connections to one SQLite file in WAL mode.
+
+    Every thread keeps a long-lived connection, so the threadpool serving
+    requests never reconnects. An empty path gives a private database in a
+    temporary directory that is removed with this object. (A shared-cache
+    in-memory database would be simpler, but its table locks ignore
+    busy_timeout and fail concurrent writers outright.)
+    """
+
+    def __init__(self, db_path: Optional[str]):
+        self._tmpdir = None
+        if not db_path:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="learning-")
+            db_path = os.path.join(self._tmpdir.name, "learning.db")
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Long-lived connection for the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class CourseRepository(SQLiteDatabase):
+    """Generated courses with a lesson lookup table.
+
+    Courses are stored as JSON rows. Storing or first reading a course walks
+    it once and indexes every lesson by id, so reads and quiz grading are
+    dictionary lookups. Public lesson copies and answer keys are built at
+    that point too, never per request. The most recently used courses stay
+    parsed in memory; any worker can load a course another one stored.
+    """
+
+    def __init__(self, db_path: Optional[str] = COURSE_DB_PATH, cache_size: int = COURSE_CACHE_SIZE):
+        super().__init__(db_path)
+        self.cache_size = cache_size
+        # course id -> (course, lesson id -> LessonRecord)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._connection().execute('''
+            CREATE TABLE IF NOT EXISTS courses (
+                id TEXT PRIMARY KEY,
+                skill TEXT,
+                level TEXT,
+                generated_at TEXT,
+                course TEXT
+            )
+        ''')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM courses').fetchone()[0]
+
+    def __contains__(self, course_id: str):
+        return self._load(course_id) is not None
+
+    def _remember(self, course_id: str, entry):
+        with self._lock:
+            self._cache[course_id] = entry
+            self._cache.move_to_end(course_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _load(self, course_id: str):
+        with self._lock:
+            entry = self._cache.get(course_id)
+            if entry is not None:
+                self._cache.move_to_end(course_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        row = self._connection().execute('SELECT course FROM courses WHERE id = ?', (course_id,)).fetchone()
+        if row is None:
+            return None
+        course = json.loads(row[0])
+        entry = (course, index_lessons(course))
+        self._remember(course_id, entry)
+        return entry
+
+    def put(self, course: Dict):
+        entry = (course, index_lessons(course))
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO courses VALUES (?, ?, ?, ?, ?)',
+                (course['id'], course.get('skill'), course.get('level'), course.get('generated_at'),
+                 json.dumps(course))
+            )
+        self._remember(course['id'], entry)
+
+    def get(self, course_id: str) -> Optional[Dict]:
+        entry = self._load(course_id)
+        return entry[0] if entry else None
+
+    def lesson(self, course_id: str, lesson_id: str) -> Optional[LessonRecord]:
+        entry = self._load(course_id)
+        return entry[1].get(lesson_id) if entry else None
+
+    def delete(self, course_id: str) -> bool:
+        with self._lock:
+            self._cache.pop(course_id, None)
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM courses WHERE id = ?', (course_id,)).rowcount > 0
+
+    def stats(self):
+        return {
+            "courses": len(self),
+            "cached_courses": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ProgressStore(SQLiteDatabase):
+    """Quiz results per (user, course, lesson).
+
+    The primary key doubles as the index for a user's progress and a
+    user's progress in one course; a second index serves per-course reads.
+    With write_behind_ms > 0, submissions are buffered and a background
+    thread writes each batch in a single transaction. Buffered results are
+    merged into reads in this process, but other workers only see them
+    after the flush.
+    """
+
+    def __init__(self, db_path: Optional[str] = COURSE_DB_PATH,
+                 write_behind_ms: float = PROGRESS_WRITE_BEHIND_MS,
+                 max_pending: int = PROGRESS_MAX_PENDING):
+        super().__init__(db_path)
+        self.interval = write_behind_ms / 1000.0
+        self.max_pending = max_pending
+        self._pending: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self.flushes = 0
+        self.written = 0
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS progress (
+                user_id TEXT,
+                course_id TEXT,
+                lesson_id TEXT,
+                score REAL,
+                passed BOOLEAN,
+                completed_at TEXT,
+                PRIMARY KEY (user_id, course_id, lesson_id)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS progress_course ON progress (course_id)')
+
+    @property
+    def write_behind(self) -> bool:
+        return self.interval > 0
+
+    def record(self, user_id: str, course_id: str, lesson_id: str, score: float, passed: bool,
+               completed_at: Optional[str] = None):
+        """Store a quiz result, replacing any earlier one for the same lesson"""
+        row = (user_id, course_id, lesson_id, score, bool(passed),
+               completed_at or datetime.utcnow().isoformat())
+        if not self.write_behind:
+            self._write([row])
+            return
+        self._ensure_started()
+        with self._lock:
+            self._pending[row[:3]] = row
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def _write(self, rows):
+        with self._transaction() as conn:
+            conn.executemany('INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?, ?, ?)', rows)
+        self.flushes += 1
+        self.written += len(rows)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="progress-write-behind", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every buffered result now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            self._write(list(pending.values()))
+        except Exception as e:
+            print(f"Failed to write {len(pending)} progress rows, retrying on the next flush: {e}")
+            with self._lock:
+                # Results recorded since the swap are newer; keep them
+                self._pending = {**pending, **self._pending}
+            return 0
+        return len(pending)
+
+    @staticmethod
+    def _entry(row) -> Dict:
+        return {"score": row[3], "passed": bool(row[4]), "completed_at": row[5]}
+
+    def _merged(self, rows, match):
+        """DB rows overlaid with buffered results whose key satisfies match"""
+        merged = {tuple(row[:3]): row for row in rows}
+        with self._lock:
+            merged.update((key, row) for key, row in self._pending.items() if match(key))
+        return merged.values()
+
+    def progress(self, user_id: str, course_id: str) -> Dict[str, Dict]:
+        """lesson id -> result for one user in one course"""
+        rows = self._connection().execute(
+            'SELECT * FROM progress WHERE user_id = ? AND course_id = ?', (user_id, course_id)
+        ).fetchall()
+        return {
+            row[2]: self._entry(row)
+            for row in self._merged(rows, lambda key: key[0] == user_id and key[1] == course_id)
+        }
+
+    def user_progress(self, user_id: str) -> Dict[str, Dict[str, Dict]]:
+        """course id -> lesson id -> result for one user"""
+        rows = self._connection().execute('SELECT * FROM progress WHERE user_id = ?', (user_id,)).fetchall()
+        courses: Dict[str, Dict] = {}
+        for row in self._merged(rows, lambda key: key[0] == user_id):
+            courses.setdefault(row[1], {})[row[2]] = self._entry(row)
+        return courses
+
+    def course_progress(self, course_id: str) -> Dict[str, Dict[str, Dict]]:
+        """user id -> lesson id -> result for one course"""
+        rows = self._connection().execute('SELECT * FROM progress WHERE course_id = ?', (course_id,)).fetchall()
+        users: Dict[str, Dict] = {}
+        for row in self._merged(rows, lambda key: key[1] == course_id):
+            users.setdefault(row[0], {})[row[2]] = self._entry(row)
+        return users
+
+    def close(self):
+        """Stop the write-behind thread and write what it still holds"""
+        if self._thread is not None:
+            self._stopped = True
+            self._wake.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        super().close()
+
+    def stats(self):
+        return {
+            "write_behind_ms": self.interval * 1000,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "written": self.written,
+        }
+
+
+# Singleton instances
+course_repository = CourseRepository()
+progress_store = ProgressStore()
@@ -1,12 +1,15 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+import copy
 import json
 import uuid
 import os
-from typing import Optional, List, Dict
+from typing import Iterator, Optional, List, Dict
 from datetime import datetime
 
+from response_cache import ResponseCache
+
 # Add to existing imports in your app.py
 try:
     from transformers import pipeline
@@ -15,6 +18,13 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
     print("Transformers not available - curriculum generation disabled")
 
+# Token budgets per generation step; each is far below one whole-course document
+OUTLINE_MAX_LENGTH = 512
+LESSON_MAX_LENGTH = 1024
+# Modules whose lessons are generated in one forward pass
+LESSON_BATCH_SIZE = int(os.getenv("CURRICULUM_BATCH_SIZE", "4"))
+MAX_LESSONS_PER_MODULE = 4
+
 class CurriculumRequest(BaseModel):
     skill: str
     level: Optional[str] = "beginner"
@@ -27,8 +37,25 @@ class QuizSubmission(BaseModel):
     lesson_id: str
     answers: List[Dict[str, int]]
 
+def request_key(req: CurriculumRequest) -> str:
+    """Normalized request; equal keys get the same generated curriculum"""
+    return json.dumps([
+        req.skill.strip().lower(),
+        (req.level or "").strip().lower(),
+        req.hours_budget,
+        " ".join((req.goal or "").lower().split()),
+    ])
+
 class CurriculumGenerator:
     def __init__(self):
+        # Generated curricula by request_key; every hit is handed out under a
+        # fresh course id. CURRICULUM_CACHE_PATH adds a SQLite tier.
+        self.cache = ResponseCache(
+            ttl=float(os.getenv("CURRICULUM_CACHE_TTL", str(7 * 24 * 3600))),
+            stale_ttl=0,
+            max_entries=int(os.getenv("CURRICULUM_CACHE_MAX_ENTRIES", "256")),
+            disk_path=os.getenv("CURRICULUM_CACHE_PATH") or None
+        )
         if TRANSFORMERS_AVAILABLE:
             self.model_name = "google/flan-t5-small"
             try:
@@ -47,81 +74,301 @@ class CurriculumGenerator:
             self.model_loaded = False
     
     def generate_course(self, req: CurriculumRequest):
+        """The finished course; see generate_stages for the incremental form"""
+        course = None
+        for event in self.generate_stages(req):
+            if event["event"] == "course":
+                course = event["course"]
+        return course
+    
+    def is_cached(self, req: CurriculumRequest) -> bool:
+        return self.cache.get(request_key(req)) is not None
+    
+    def generate_stages(self, req: CurriculumRequest) -> Iterator[Dict]:
+        """Yield {"event": "outline"}, one {"event": "stage"} per finished
+        stage, then {"event": "course"} with the complete course.
+        
+        The model writes a short outline first, then the lessons of every
+        module in one batched pipeline call. Each piece is validated as it
+        arrives; a module whose output doesn't parse gets placeholder lessons
+        from its outline instead of failing the whole course.
+        """
         if not self.model_loaded:
-            return self._get_sample_course(req.skill)
+            yield from self._replay(self._get_sample_course(req.skill))
+            return
+        
+        key = request_key(req)
+        template = self.cache.get(key)
+        if template is not None:
+            yield from self._replay(self._with_metadata(copy.deepcopy(template), req))
+            return
         
+        outline = self._generate_outline(req)
+        course = {
+            "rootTitle": outline["rootTitle"],
+            "generated_at": datetime.utcnow().isoformat(),
+            "stages": outline["stages"]
+        }
+        yield {"event": "outline", **self._outline_view(course)}
+        
+        modules = [(s, m) for s, stage in enumerate(course["stages"]) for m in range(len(stage["modules"]))]
+        remaining = [len(stage["modules"]) for stage in course["stages"]]
+        invalid = 0
+        for (s, m), text in zip(modules, self._generate_lessons(req, course, modules)):
+            module = course["stages"][s]["modules"][m]
+            parsed = self._parse_lessons(text, module, s, m)
+            # Every outline title gets a lesson; ones the model didn't
+            # deliver, or delivered unusable, become placeholders
+            if any(lesson is None for lesson in parsed):
+                invalid += 1
+            module["lessons"] = [
+                lesson or self._placeholder_lesson(req.skill, title, s, m, i)
+                for i, (lesson, title) in enumerate(zip(parsed, module["lessons"]))
+            ]
+            remaining[s] -= 1
+            if remaining[s] == 0:
+                yield {"event": "stage", "index": s, "stage": course["stages"][s]}
+        
+        if invalid:
+            print(f"{invalid} of {len(modules)} modules for '{req.skill}' used placeholder lessons")
+        # Courses that came out mostly placeholders aren't worth keeping
+        if invalid * 2 <= len(modules):
+            self.cache.put(key, course)
+        yield {"event": "course", "course": self._with_metadata(copy.deepcopy(course), req)}
+    
+    def _with_metadata(self, course: Dict, req: CurriculumRequest) -> Dict:
+        course['id'] = str(uuid.uuid4())
+        course['skill'] = req.skill
+        course['level'] = req.level
+        return course
+    
+    def _outline_view(self, course: Dict) -> Dict:
+        """Course skeleton: stage and module titles with lesson titles only"""
+        return {
+            "rootTitle": course.get("rootTitle"),
+            "stages": [
+                {
+                    "id": stage.get("id"),
+                    "title": stage.get("title"),
+                    "summary": stage.get("summary"),
+                    "modules": [
+                        {
+                            "id": module.get("id"),
+                            "title": module.get("title"),
+                            "lessons": [l if isinstance(l, str) else l.get("title") for l in module.get("lessons", [])]
+                        }
+                        for module in stage.get("modules", [])
+                    ]
+                }
+                for stage in course.get("stages", [])
+            ]
+        }
+    
+    def _replay(self, course: Dict) -> Iterator[Dict]:
+        """Events for a course that already exists in full"""
+        yield {"event": "outline", **self._outline_view(course)}
+        for s, stage in enumerate(course.get("stages", [])):
+            yield {"event": "stage", "index": s, "stage": stage}
+        yield {"event": "course", "course": course}
+    
+    def _generate_outline(self, req: CurriculumRequest) -> Dict:
+        """Stages, modules and lesson titles; a generic outline if the model's doesn't parse"""
         prompt = f"""
-Create a structured learning curriculum for: {req.skill}
+Create a course outline for: {req.skill}
 Target level: {req.level}
 Total hours: {req.hours_budget}
 Goal: {req.goal}
 
 Output ONLY valid JSON with this exact structure:
 {{
-  "skill": "string",
-  "rootTitle": "string", 
+  "rootTitle": "string",
   "stages": [
     {{
-      "id": "stage-1",
       "title": "string",
       "summary": "string",
       "modules": [
-        {{
-          "id": "m-1-1",
-          "title": "string",
-          "lessons": [
-            {{
-              "id": "l-1-1-1",
-              "title": "string",
-              "time_min": 45,
-              "content": "string (learning material)",
-              "tasks": ["string", "string", "string"],
-              "resources": [
-                {{"type": "youtube", "title": "string", "url": "string"}},
-                {{"type": "article", "title": "string", "url": "string"}}
-              ],
-              "quiz": {{
-                "passing_score": 70,
-                "questions": [
-                  {{
-                    "id": "q1",
-                    "type": "mcq",
-                    "prompt": "string",
-                    "options": ["string", "string", "string", "string"],
-                    "correct_index": 0
-                  }}
-                ]
-              }}
-            }}
-          ]
-        }}
+        {{"title": "string", "lessons": ["lesson title", "lesson title"]}}
       ]
     }}
   ]
 }}
 
 Make 3 stages. Each stage: 2-3 modules. Each module: 2-3 lessons.
-Total lessons: 12-18. Each lesson: 30-90 minutes.
-Include practical tasks and relevant resources.
 """
         try:
-            result = self.pipe(prompt, max_length=4096)[0]["generated_text"]
-            
-            # Clean and parse JSON
-            cleaned = self._clean_json_output(result)
-            course_data = json.loads(cleaned)
-            
-            # Add metadata
-            course_data['id'] = str(uuid.uuid4())
-            course_data['generated_at'] = datetime.utcnow().isoformat()
-            course_data['skill'] = req.skill
-            course_data['level'] = req.level
-            
-            return course_data
-            
+            result = self.pipe(prompt, max_length=OUTLINE_MAX_LENGTH)[0]["generated_text"]
+            outline = self._parse_outline(json.loads(self._clean_json_output(result)), req.skill)
+            if outline is not None:
+                return outline
+            print(f"Outline for '{req.skill}' had no usable stages, using the default outline")
         except Exception as e:
-            print(f"Error generating course: {e}")
-            return self._get_sample_course(req.skill)
+            print(f"Error generating outline: {e}")
+        return self._parse_outline(self._default_outline(req.skill), req.skill)
+    
+    def _parse_outline(self, raw, skill: str) -> Optional[Dict]:
+        """Keep stages and modules that have titles and lessons, and assign ids"""
+        if not isinstance(raw, dict) or not isinstance(raw.get("stages"), list):
+            return None
+        stages = []
+        for stage in raw["stages"]:
+            if not isinstance(stage, dict) or not isinstance(stage.get("modules"), list):
+                continue
+            modules = []
+            for module in stage["modules"]:
+                if not isinstance(module, dict) or not isinstance(module.get("lessons"), list):
+                    continue
+                titles = [t.get("title") if isinstance(t, dict) else t for t in module["lessons"]]
+                titles = [t.strip() for t in titles if isinstance(t, str) and t.strip()][:MAX_LESSONS_PER_MODULE]
+                if not titles:
+                    continue
+                s, m = len(stages) + 1, len(modules) + 1
+                modules.append({
+                    "id": f"m-{s}-{m}",
+                    "title": str(module.get("title") or f"Module {m}"),
+                    "lessons": titles
+                })
+            if modules:
+                s = len(stages) + 1
+                stages.append({
+                    "id": f"stage-{s}",
+                    "title": str(stage.get("title") or f"Stage {s}"),
+                    "summary": str(stage.get("summary") or ""),
+                    "modules": modules
+                })
+        if not stages:
+            return None
+        return {"rootTitle": str(raw.get("rootTitle") or f"Learn {skill}"), "stages": stages}
+    
+    def _default_outline(self, skill: str) -> Dict:
+        return {
+            "rootTitle": f"Learn {skill}",
+            "stages": [
+                {"title": "Foundations", "summary": f"Core concepts of {skill}", "modules": [
+                    {"title": "Getting Started", "lessons": [f"Introduction to {skill}", "Setting up your environment"]},
+                    {"title": "Key Concepts", "lessons": ["Essential terminology", "Core building blocks"]}
+                ]},
+                {"title": "Core Skills", "summary": f"Working with {skill} day to day", "modules": [
+                    {"title": "Common Tasks", "lessons": ["Everyday workflows", "Common pitfalls"]},
+                    {"title": "Best Practices", "lessons": ["Writing maintainable work", "Testing and review"]}
+                ]},
+                {"title": "Applied Projects", "summary": f"Putting {skill} to work", "modules": [
+                    {"title": "Guided Project", "lessons": ["Planning a project", "Building the project"]},
+                    {"title": "Next Steps", "lessons": ["Portfolio and interviews", "Further learning"]}
+                ]}
+            ]
+        }
+    
+    def _generate_lessons(self, req: CurriculumRequest, course: Dict, modules) -> Iterator[Optional[str]]:
+        """Generated text per module, in order, from one batched pipeline call.
+        
+        The prompts go in as a generator so results come back batch by batch
+        rather than after every module is done. If the pipeline fails, the
+        modules it didn't reach yield None.
+        """
+        def prompts():
+            for s, m in modules:
+                stage = course["stages"][s]
+                module = stage["modules"][m]
+                yield f"""
+Write the lessons for the module "{module['title']}" of the stage "{stage['title']}"
+in a {req.level} course on {req.skill}.
+Lessons: {json.dumps(module['lessons'])}
+
+Output ONLY a valid JSON array with one object per lesson, in order:
+[
+  {{
+    "title": "string",
+    "time_min": 45,
+    "content": "string (learning material)",
+    "tasks": ["string", "string", "string"],
+    "resources": [{{"type": "youtube", "title": "string", "url": "string"}}],
+    "quiz": {{
+      "passing_score": 70,
+      "questions": [
+        {{"type": "mcq", "prompt": "string", "options": ["string", "string", "string", "string"], "correct_index": 0}}
+      ]
+    }}
+  }}
+]
+"""
+        produced = 0
+        try:
+            for output in self.pipe(prompts(), batch_size=LESSON_BATCH_SIZE, max_length=LESSON_MAX_LENGTH):
+                output = output[0] if isinstance(output, list) else output
+                produced += 1
+                yield output["generated_text"]
+        except Exception as e:
+            print(f"Error generating lessons: {e}")
+        for _ in range(len(modules) - produced):
+            yield None
+    
+    def _parse_lessons(self, text: Optional[str], module: Dict, s: int, m: int) -> List[Optional[Dict]]:
+        """One validated lesson per outline title, None where the output has none usable"""
+        titles = module["lessons"]
+        if text is None:
+            return [None] * len(titles)
+        start, end = text.find('['), text.rfind(']') + 1
+        try:
+            raw = json.loads(text[start:end] if start >= 0 and end > start else self._clean_json_output(text))
+        except ValueError:
+            return [None] * len(titles)
+        if isinstance(raw, dict):
+            raw = raw.get("lessons")
+        if not isinstance(raw, list):
+            return [None] * len(titles)
+        # Extra lessons beyond the outline are dropped; missing ones stay None
+        raw = raw[:len(titles)] + [None] * (len(titles) - len(raw))
+        return [self._validate_lesson(item, title, s, m, i) for i, (item, title) in enumerate(zip(raw, titles))]
+    
+    def _validate_lesson(self, raw, title: str, s: int, m: int, i: int) -> Optional[Dict]:
+        """Coerce one generated lesson into the course schema; None if it has no content"""
+        if not isinstance(raw, dict) or not str(raw.get("content") or "").strip():
+            return None
+        try:
+            time_min = min(180, max(10, int(raw.get("time_min") or 45)))
+        except (TypeError, ValueError):
+            time_min = 45
+        quiz = raw.get("quiz") if isinstance(raw.get("quiz"), dict) else {}
+        questions = []
+        for q in quiz.get("questions") or []:
+            if not isinstance(q, dict) or not isinstance(q.get("options"), list) or len(q["options"]) < 2:
+                continue
+            correct = q.get("correct_index")
+            if not isinstance(correct, int) or not 0 <= correct < len(q["options"]):
+                continue
+            questions.append({
+                "id": f"q{len(questions) + 1}",
+                "type": "mcq",
+                "prompt": str(q.get("prompt") or ""),
+                "options": [str(o) for o in q["options"]],
+                "correct_index": correct
+            })
+        return {
+            "id": f"l-{s + 1}-{m + 1}-{i + 1}",
+            "title": str(raw.get("title") or title),
+            "time_min": time_min,
+            "content": str(raw["content"]),
+            "tasks": [str(t) for t in raw.get("tasks") or [] if t],
+            "resources": [r for r in raw.get("resources") or [] if isinstance(r, dict) and r.get("url")],
+            "quiz": {"passing_score": quiz.get("passing_score", 70), "questions": questions}
+        }
+    
+    def _placeholder_lesson(self, skill: str, title: str, s: int, m: int, i: int) -> Dict:
+        return {
+            "id": f"l-{s + 1}-{m + 1}-{i + 1}",
+            "title": title,
+            "time_min": 45,
+            "content": f"{title}: study this topic as part of learning {skill}.",
+            "tasks": [f"Read an introduction to {title.lower()}", "Write a short summary of what you learned"],
+            "resources": [
+                {
+                    "type": "youtube",
+                    "title": f"{title} tutorial",
+                    "url": "https://www.youtube.com/results?search_query=" + f"{skill} {title}".replace(" ", "+")
+                }
+            ],
+            "quiz": {"passing_score": 70, "questions": []}
+        }
     
     def _clean_json_output(self, text: str) -> str:
         """Extract JSON from model output"""
@@ -198,7 +445,3 @@ Include practical tasks and relevant resources.
 
 # Initialize generator
 curriculum_generator = CurriculumGenerator()
-
-# In-memory storage (replace with database in production)
-COURSES_DB = {}
-USER_PROGRESS = {}
\ No newline at end of file
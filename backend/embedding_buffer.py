@@ -0,0 +1,129 @@
+# backend/embedding_buffer.py
+from typing import Optional
+
+import numpy as np
+
+
+class EmbeddingBuffer:
+    """Growable row-major embedding matrix with capacity doubling.
+
+    Appends are amortized O(1): the backing array only gets reallocated when
+    it is full, and then to twice its size. `view()` returns the filled rows
+    without copying. Deleted rows are tombstoned rather than removed, so row
+    numbers stay stable for the vector index until `compact()` is called.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024, dtype=np.float32):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._initial_capacity = max(1, capacity)
+        self._data = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self.tombstones = 0
+        if dim is not None:
+            self._allocate(self._initial_capacity)
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, dtype=np.float32):
+        """Wrap an existing matrix (e.g. a read-only memmap) without copying.
+
+        The array is only copied into a private, growable allocation the
+        first time rows are appended.
+        """
+        buffer = cls(dim=array.shape[1], capacity=len(array) or 1, dtype=dtype)
+        if array.dtype == buffer.dtype and len(array):
+            buffer._data = array
+        else:
+            buffer._data[:len(array)] = array
+        buffer._alive = np.ones(buffer.capacity, dtype=bool)
+        buffer._size = len(array)
+        return buffer
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._data is None else self._data.shape[0]
+
+    @property
+    def live_count(self) -> int:
+        return self._size - self.tombstones
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return self.tombstones / self._size if self._size else 0.0
+
+    def _allocate(self, capacity: int):
+        data = np.empty((capacity, self.dim), dtype=self.dtype)
+        alive = np.zeros(capacity, dtype=bool)
+        if self._data is not None:
+            data[:self._size] = self._data[:self._size]
+            alive[:self._size] = self._alive[:self._size]
+        self._data = data
+        self._alive = alive
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= self.capacity:
+            return
+        capacity = max(self.capacity, self._initial_capacity)
+        while capacity < needed:
+            capacity *= 2
+        self._allocate(capacity)
+
+    def append(self, vectors: np.ndarray) -> int:
+        """Append rows and return the row number of the first one"""
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        start = self._size
+        self._reserve(len(vectors))
+        self._data[start:start + len(vectors)] = vectors
+        self._alive[start:start + len(vectors)] = True
+        self._size += len(vectors)
+        return start
+
+    def view(self) -> Optional[np.ndarray]:
+        """Read-only, zero-copy view over the filled rows"""
+        if self._data is None:
+            return None
+        view = self._data[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def alive(self) -> np.ndarray:
+        """Read-only mask of rows that haven't been tombstoned"""
+        view = self._alive[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def tombstone(self, rows) -> int:
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        rows = rows[self._alive[rows]]
+        self._alive[rows] = False
+        self.tombstones += len(rows)
+        return len(rows)
+
+    def compact(self) -> np.ndarray:
+        """Drop tombstoned rows and return the mask of kept rows.
+
+        Survivors are copied into a fresh array so views handed out earlier
+        keep pointing at consistent data.
+        """
+        keep = self._alive[:self._size].copy()
+        if self.tombstones:
+            kept = self._data[:self._size][keep]
+            self._data = None
+            self._size = 0
+            self.tombstones = 0
+            self._allocate(max(self._initial_capacity, 2 * len(kept)))
+            if len(kept):
+                self.append(kept)
+        return keep
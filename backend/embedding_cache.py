@@ -0,0 +1,158 @@
+# backend/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for a text; MiniLM is uncased so case and spacing don't matter"""
+    return " ".join((text or "").lower().split())
+
+
+class EmbeddingCache:
+    """LRU cache of normalized embeddings bounded by a memory budget.
+
+    An optional SQLite file acts as a second tier so vectors survive restarts
+    and can be shared by several workers on the same host.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn = None
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB
+                )
+            ''')
+            self._conn.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_size(key: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(key)
+
+    @staticmethod
+    def _disk_key(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        if self._conn is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT vector FROM embeddings WHERE key = ?', (self._disk_key(key),)
+                ).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._put_memory(key, vector)
+                with self._lock:
+                    self.disk_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, vector: np.ndarray):
+        self.put_many([key], [vector])
+
+    def put_many(self, keys: List[str], vectors):
+        rows = []
+        for key, vector in zip(keys, vectors):
+            vector = np.array(vector, dtype=np.float32)
+            vector.setflags(write=False)
+            self._put_memory(key, vector)
+            rows.append((self._disk_key(key), vector.tobytes()))
+        if self._conn is not None and rows:
+            with self._lock:
+                self._conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?)', rows)
+                self._conn.commit()
+
+    def _put_memory(self, key: str, vector: np.ndarray):
+        size = self._entry_size(key, vector)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._entry_size(key, old)
+            self._entries[key] = vector
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_vector)
+                self.evictions += 1
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for texts, calling encode_fn only for cache misses.
+
+        encode_fn receives a list of unique normalized texts and must return
+        their L2-normalized embeddings as a 2D array.
+        """
+        keys = [normalize_text(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            vector = self.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                found[key] = vector
+
+        if missing:
+            new_embs = np.asarray(encode_fn(missing), dtype=np.float32)
+            self.put_many(missing, new_embs)
+            found.update(zip(missing, new_embs))
+
+        return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "disk_path": self.disk_path,
+        }
+
+
+# Shared instance used by app.embed_texts
+embedding_cache = EmbeddingCache(
+    max_bytes=int(float(os.getenv("EMBEDDING_CACHE_MB", "64")) * 1024 * 1024),
+    disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+)
@@ -0,0 +1,405 @@
+# backend/generation_jobs.py
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional
+
+from course_store import COURSE_DB_PATH, SQLiteDatabase
+
+# Generation threads; the model is shared, so more workers mostly add memory
+# pressure unless the host has spare cores
+CURRICULUM_WORKERS = int(os.getenv("CURRICULUM_WORKERS", "1"))
+# Jobs waiting for a worker before new requests are turned away
+CURRICULUM_MAX_QUEUED = int(os.getenv("CURRICULUM_MAX_QUEUED", "32"))
+# Finished jobs kept around for polling
+CURRICULUM_JOB_HISTORY = int(os.getenv("CURRICULUM_JOB_HISTORY", "1000"))
+# How often the process owning an unfinished job marks it alive, in seconds
+CURRICULUM_HEARTBEAT_SECONDS = float(os.getenv("CURRICULUM_HEARTBEAT_SECONDS", "5"))
+# An unfinished job not marked alive for this long is taken to have died
+# with its process: it stops absorbing duplicate requests and reads as failed
+CURRICULUM_JOB_STALE_SECONDS = float(os.getenv("CURRICULUM_JOB_STALE_SECONDS",
+                                               str(3 * CURRICULUM_HEARTBEAT_SECONDS)))
+# How often waiters re-read a job that runs in another process, in seconds
+REMOTE_POLL_SECONDS = 0.25
+
+IN_FLIGHT = ("queued", "running")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class GenerationJob:
+    """One queued or running generation and, once done, its result.
+
+    Jobs run by another process are loaded from the job store; they have
+    no request or future and are refreshed from the store instead.
+    """
+
+    def __init__(self, key: Hashable, request, job_id: Optional[str] = None):
+        self.id = job_id or str(uuid.uuid4())
+        self.key = key
+        self.request = request
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        # Progress reported by run_fn while it works, e.g. finished stages
+        self.events: List[Dict] = []
+        # Shared by every caller that was collapsed onto this job
+        self.future: Optional[Future] = Future() if request is not None else None
+        self.waiters = 1
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def local(self) -> bool:
+        return self.future is not None
+
+    def describe(self) -> Dict:
+        info = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "waiters": self.waiters,
+            "events": len(self.events),
+        }
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class GenerationJobStore(SQLiteDatabase):
+    """Job rows and reported events, shared by every worker process.
+
+    Lets any worker answer polls for a job another one is running, and
+    lets duplicate requests find an in-flight job across processes.
+    """
+
+    def __init__(self, db_path: Optional[str] = COURSE_DB_PATH, stale_after: float = CURRICULUM_JOB_STALE_SECONDS):
+        super().__init__(db_path)
+        self.stale_after = stale_after
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS generation_jobs (
+                id TEXT PRIMARY KEY,
+                key TEXT,
+                status TEXT,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT,
+                waiters INTEGER,
+                heartbeat_at REAL
+            )
+        ''')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(generation_jobs)')}
+        if 'heartbeat_at' not in columns:
+            # Tables created before heartbeats; old rows fall back to created_at
+            conn.execute('ALTER TABLE generation_jobs ADD COLUMN heartbeat_at REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS generation_jobs_key ON generation_jobs (key, status)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS generation_events (
+                job_id TEXT,
+                seq INTEGER,
+                event TEXT,
+                PRIMARY KEY (job_id, seq)
+            )
+        ''')
+
+    def claim(self, job: GenerationJob) -> Optional[GenerationJob]:
+        """Insert job unless another live job has its key; returns that one instead"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT * FROM generation_jobs WHERE key = ? AND status IN (?, ?) '
+                'AND COALESCE(heartbeat_at, created_at) > ? ORDER BY created_at DESC LIMIT 1',
+                (str(job.key), *IN_FLIGHT, time.time() - self.stale_after)
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE generation_jobs SET waiters = waiters + 1 WHERE id = ?', (row[0],))
+                existing = self._from_row(row)
+                existing.waiters += 1
+                return existing
+            conn.execute('INSERT INTO generation_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (*self._values(job), time.time()))
+        return None
+
+    def save(self, job: GenerationJob):
+        """Write the job's progress; waiters is left alone, other processes add to it"""
+        values = self._values(job)
+        with self._transaction() as conn:
+            conn.execute('UPDATE generation_jobs SET status = ?, started_at = ?, finished_at = ?, result = ?, '
+                         'error = ?, heartbeat_at = ? WHERE id = ?', (values[2], *values[4:8], time.time(), job.id))
+
+    def heartbeat(self, job_ids: List[str]):
+        """Mark jobs this process still owns as alive"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany('UPDATE generation_jobs SET heartbeat_at = ? WHERE id = ?',
+                             [(now, job_id) for job_id in job_ids])
+
+    def add_waiter(self, job: GenerationJob):
+        with self._transaction() as conn:
+            conn.execute('UPDATE generation_jobs SET waiters = waiters + 1 WHERE id = ?', (job.id,))
+
+    def add_event(self, job: GenerationJob, seq: int, event: Dict):
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO generation_events VALUES (?, ?, ?)',
+                         (job.id, seq, json.dumps(event)))
+
+    def load(self, job_id: str) -> Optional[GenerationJob]:
+        row = self._connection().execute('SELECT * FROM generation_jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._from_row(row)
+        self._load_events(job)
+        return job
+
+    def refresh(self, job: GenerationJob):
+        """Bring a job run elsewhere up to date, appending events it hasn't seen"""
+        row = self._connection().execute('SELECT * FROM generation_jobs WHERE id = ?', (job.id,)).fetchone()
+        if row is not None:
+            self._update(job, row)
+        self._load_events(job)
+
+    def trim(self, history: int):
+        """Drop finished jobs beyond the newest `history` of them"""
+        with self._transaction() as conn:
+            stale = [row[0] for row in conn.execute(
+                'SELECT id FROM generation_jobs WHERE status NOT IN (?, ?) '
+                'ORDER BY finished_at DESC LIMIT -1 OFFSET ?', (*IN_FLIGHT, history)
+            )]
+            conn.executemany('DELETE FROM generation_jobs WHERE id = ?', [(i,) for i in stale])
+            conn.executemany('DELETE FROM generation_events WHERE job_id = ?', [(i,) for i in stale])
+
+    def _load_events(self, job: GenerationJob):
+        rows = self._connection().execute(
+            'SELECT event FROM generation_events WHERE job_id = ? AND seq >= ? ORDER BY seq',
+            (job.id, len(job.events))
+        ).fetchall()
+        job.events.extend(json.loads(row[0]) for row in rows)
+
+    @staticmethod
+    def _values(job: GenerationJob) -> tuple:
+        return (job.id, str(job.key), job.status, job.created_at, job.started_at, job.finished_at,
+                None if job.result is None else json.dumps(job.result), job.error, job.waiters)
+
+    def _from_row(self, row) -> GenerationJob:
+        job = GenerationJob(row[1], None, job_id=row[0])
+        self._update(job, row)
+        return job
+
+    def _update(self, job: GenerationJob, row):
+        job.status, job.created_at, job.started_at, job.finished_at = row[2:6]
+        job.result = None if row[6] is None else json.loads(row[6])
+        job.error = row[7]
+        job.waiters = row[8]
+        heartbeat_at = row[9] if row[9] is not None else job.created_at
+        if job.status in IN_FLIGHT and time.time() - heartbeat_at > self.stale_after:
+            job.status = "failed"
+            job.error = "Abandoned: the worker running this job stopped"
+
+
+class GenerationQueue:
+    """Runs slow generation calls on a bounded worker pool, off the event loop.
+
+    submit() returns a job immediately; callers poll get() or await wait().
+    run_fn(request, report) may call report(event) to publish partial
+    results, which collect in job.events for streaming.
+    Requests with the same key while a job is queued or running are
+    collapsed onto that job instead of generating twice. Finished jobs are
+    kept for polling, oldest dropped first, up to `history` of them.
+
+    With a GenerationJobStore, jobs and their events are also written to
+    the shared database, so under several server processes a job can be
+    polled, awaited or streamed from any of them and duplicates are
+    collapsed across processes. A heartbeat thread keeps this process's
+    unfinished jobs marked alive, so others stop waiting soon after it dies.
+    Without a store, all of that is per process.
+    """
+
+    def __init__(self, run_fn: Callable, key_fn: Callable[[object], Hashable],
+                 workers: int = CURRICULUM_WORKERS, max_queued: int = CURRICULUM_MAX_QUEUED,
+                 history: int = CURRICULUM_JOB_HISTORY, store: Optional[GenerationJobStore] = None):
+        self.run_fn = run_fn
+        self.key_fn = key_fn
+        self.workers = workers
+        self.max_queued = max_queued
+        self.history = history
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="curriculum")
+        self._jobs = OrderedDict()
+        self._in_flight: Dict[Hashable, GenerationJob] = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failures = 0
+        self.rejected = 0
+        self._stopped = threading.Event()
+        if store is not None:
+            threading.Thread(target=self._heartbeat, name="curriculum-heartbeat", daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(CURRICULUM_HEARTBEAT_SECONDS):
+            with self._lock:
+                job_ids = [job.id for job in self._in_flight.values()]
+            if not job_ids:
+                continue
+            try:
+                self.store.heartbeat(job_ids)
+            except Exception as e:
+                print(f"Failed to mark curriculum generations alive: {e}")
+
+    def submit(self, request):
+        """(job, created); created is False when an in-flight job was reused.
+
+        Raises QueueFull when max_queued jobs are already waiting.
+        """
+        key = self.key_fn(request)
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.waiters += 1
+                self.deduplicated += 1
+                if self.store is not None:
+                    self.store.add_waiter(job)
+                return job, False
+            queued = sum(1 for j in self._in_flight.values() if j.status == "queued")
+            if queued >= self.max_queued:
+                self.rejected += 1
+                raise QueueFull(f"{queued} curriculum generations already queued")
+            job = GenerationJob(key, request)
+            if self.store is not None:
+                existing = self.store.claim(job)
+                if existing is not None:
+                    # Another process is already generating this
+                    self.deduplicated += 1
+                    return existing, False
+            self._in_flight[key] = job
+            self._jobs[job.id] = job
+            self.submitted += 1
+            self._trim()
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def _trim(self):
+        # Drop the oldest finished jobs; in-flight ones are never dropped
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in [i for i, j in self._jobs.items() if j.done][:excess]:
+            del self._jobs[job_id]
+
+    def _report(self, job: GenerationJob, event: Dict):
+        seq = len(job.events)
+        job.events.append(event)
+        if self.store is not None:
+            self.store.add_event(job, seq, event)
+
+    def _save(self, job: GenerationJob):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+        except Exception as e:
+            print(f"Failed to persist curriculum generation {job.id}: {e}")
+
+    def _run(self, job: GenerationJob):
+        with self._lock:
+            # Failed by close() before a worker got to it
+            if job.done:
+                return
+            job.status = "running"
+            job.started_at = time.time()
+        self._save(job)
+        try:
+            job.result = self.run_fn(job.request, lambda event: self._report(job, event))
+            job.status = "done"
+            self.completed += 1
+        except Exception as e:
+            print(f"Curriculum generation {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+            self.failures += 1
+        self._finish(job)
+
+    def _finish(self, job: GenerationJob):
+        job.finished_at = time.time()
+        self._save(job)
+        if self.store is not None:
+            try:
+                self.store.trim(self.history)
+            except Exception as e:
+                print(f"Failed to trim curriculum generation history: {e}")
+        with self._lock:
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+        job.future.set_result(job)
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        return job
+
+    async def wait(self, job: GenerationJob, timeout: Optional[float] = None) -> GenerationJob:
+        """Wait for a job without blocking the event loop; returns it finished or not"""
+        if job.local:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return job
+        # Running in another process: re-read it until it finishes
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            await asyncio.to_thread(self.store.refresh, job)
+            if job.done:
+                return job
+            remaining = REMOTE_POLL_SECONDS if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            await asyncio.sleep(min(REMOTE_POLL_SECONDS, remaining))
+
+    def close(self):
+        """Stop the workers; jobs that never started are failed so waiters return"""
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            cancelled = [job for job in self._in_flight.values() if job.status == "queued"]
+            for job in cancelled:
+                job.status = "failed"
+                job.error = "Server shut down before the job started"
+        for job in cancelled:
+            self.failures += 1
+            self._finish(job)
+
+    def stats(self):
+        with self._lock:
+            in_flight = list(self._in_flight.values())
+        return {
+            "workers": self.workers,
+            "queued": sum(1 for j in in_flight if j.status == "queued"),
+            "running": sum(1 for j in in_flight if j.status == "running"),
+            "max_queued": self.max_queued,
+            "jobs_kept": len(self._jobs),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "shared": self.store is not None,
+        }
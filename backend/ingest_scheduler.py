@@ -0,0 +1,123 @@
+# backend/ingest_scheduler.py
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from adzuna_harvester import AdzunaHarvester
+
+
+class IngestScheduler:
+    """Runs Adzuna harvests in the background, on a timer and on demand.
+
+    Started from the app lifespan. Each run streams pages through the
+    harvester into ingest_fn, which embeds in worker threads, so the event
+    loop and /match never wait on the network or the model. ingest_fn is
+    expected to publish its own snapshot after every batch.
+    """
+
+    def __init__(self, harvester: AdzunaHarvester, ingest_fn: Callable[[List[Dict]], Dict],
+                 queries: List[str], locations: List[str], interval_seconds: float = 3600,
+                 max_pages: Optional[int] = None):
+        self.harvester = harvester
+        self.ingest_fn = ingest_fn
+        self.queries = queries
+        self.locations = locations
+        self.interval_seconds = interval_seconds
+        self.max_pages = max_pages
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # trigger() runs in threadpool handlers, _run() on the event loop
+        self._pending_lock = threading.Lock()
+        self._pending = set()
+        self._task: Optional[asyncio.Task] = None
+        self._next_run: Optional[float] = None
+        self.running = None
+        self.last_run = None
+        self.last_success: Optional[float] = None
+        self.runs = 0
+        self.failures = 0
+
+    async def start(self, run_now: bool = False):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._next_run = time.time() + (0 if run_now else self.interval_seconds)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._loop = None
+
+    def trigger(self, queries: Optional[List[str]] = None, locations: Optional[List[str]] = None) -> bool:
+        """Queue an on-demand harvest; identical pending requests are collapsed.
+
+        Safe to call from any thread: the queue is only touched on the
+        event loop, which is woken to pick the request up immediately.
+        """
+        key = (tuple(queries or self.queries), tuple(locations or self.locations))
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        with self._pending_lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        loop.call_soon_threadsafe(self._queue.put_nowait, key)
+        return True
+
+    async def _next_request(self):
+        timeout = max(0.0, self._next_run - time.time())
+        try:
+            key = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            return key, "on_demand"
+        except asyncio.TimeoutError:
+            self._next_run = time.time() + self.interval_seconds
+            return (tuple(self.queries), tuple(self.locations)), "periodic"
+
+    async def _run(self):
+        while True:
+            (queries, locations), reason = await self._next_request()
+            self.running = {"reason": reason, "queries": list(queries), "locations": list(locations),
+                            "started_at": time.time()}
+            start = time.time()
+            try:
+                result = await self.harvester.harvest_into(
+                    self.ingest_fn, queries, locations, max_pages=self.max_pages
+                )
+                self.last_success = time.time()
+                self.last_run = {**self.running, "ok": True, "result": result}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                print(f"Background ingest failed: {e}")
+                self.last_run = {**self.running, "ok": False, "error": str(e)}
+            finally:
+                with self._pending_lock:
+                    self._pending.discard((queries, locations))
+                self.running = None
+            self.runs += 1
+            self.last_run["seconds"] = round(time.time() - start, 2)
+            self.last_run["finished_at"] = time.time()
+
+    def status(self):
+        now = time.time()
+        return {
+            "active": self._task is not None and not self._task.done(),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self.running,
+            "last_run": self.last_run,
+            "runs": self.runs,
+            "failures": self.failures,
+            "staleness_seconds": round(now - self.last_success, 1) if self.last_success else None,
+            "next_periodic_run_in": round(max(0.0, self._next_run - now), 1) if self._next_run else None,
+            "interval_seconds": self.interval_seconds,
+            "queries": self.queries,
+            "locations": self.locations,
+        }
@@ -0,0 +1,151 @@
+# backend/job_filters.py
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from typing import Optional, Sequence
+
+import numpy as np
+
+from reranker import JobFeatures, EPOCH, SECONDS_PER_DAY, normalize_location
+
+# Combined bitmaps kept per snapshot, keyed by filter
+FILTER_CACHE_SIZE = int(os.getenv("FILTER_CACHE_SIZE", "64"))
+# Below this share of rows passing a filter, search_topk scores the passing
+# rows exactly instead of asking the ANN index to skip everything else
+EXACT_FILTER_RATIO = float(os.getenv("FILTER_EXACT_RATIO", "0.05"))
+# Recency cutoffs are rounded down to this many seconds so requests made a
+# few minutes apart share one cached bitmap
+RECENCY_GRANULARITY = 3600
+
+# Structured constraints applied before vector search. None means "any".
+#   remote: only remote (True) or only on-site (False) postings
+#   locations: normalized location must contain one of these strings
+#   max_years: minYearsExperience must be at most this
+#   posted_within_days: posted no longer ago than this; undated rows fail
+JobFilter = namedtuple("JobFilter", ["remote", "locations", "max_years", "posted_within_days"],
+                       defaults=(None, None, None, None))
+
+
+def make_filter(remote: Optional[bool] = None, locations: Optional[Sequence[str]] = None,
+                max_years: Optional[float] = None,
+                posted_within_days: Optional[float] = None) -> Optional[JobFilter]:
+    """Canonical, hashable filter; None when nothing is constrained"""
+    locs = tuple(sorted({normalize_location(l) for l in locations or [] if normalize_location(l)}))
+    job_filter = JobFilter(
+        remote=remote,
+        locations=locs or None,
+        max_years=None if max_years is None else int(max_years),
+        posted_within_days=posted_within_days
+    )
+    return job_filter if any(v is not None for v in job_filter) else None
+
+
+class FilterIndex:
+    """Packed bitmaps over one snapshot's feature columns.
+
+    Each clause is answered from a small index built on first use: an
+    inverted index from distinct locations to rows, one bitmap per
+    experience bucket, and a posted-date sort order for range cuts. Clause
+    bitmaps and their AND-ed combinations are cached, so repeated filters
+    cost a dictionary lookup. Bitmaps are little-endian packed uint8, the
+    layout FAISS' IDSelectorBitmap reads.
+    """
+
+    def __init__(self, features: JobFeatures, alive: np.ndarray):
+        self.features = features
+        self.n = len(alive)
+        self._alive = np.packbits(alive, bitorder="little")
+        self._location_vocab = None
+        self._location_codes = None
+        self._date_order = None
+        self._dated = 0
+        self._clauses = {}
+        self._combined = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        return np.packbits(mask, bitorder="little")
+
+    def unpack(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bitmap, count=self.n, bitorder="little").view(bool)
+
+    def _location_bitmap(self, locations):
+        if self._location_vocab is None:
+            self._location_vocab, self._location_codes = np.unique(
+                self.features.location, return_inverse=True)
+        # Substring match against the distinct values, like the reranker
+        matching = np.zeros(len(self._location_vocab), dtype=bool)
+        for loc in locations:
+            matching |= np.char.find(self._location_vocab, loc) >= 0
+        return self._pack(matching[self._location_codes])
+
+    def _recency_bitmap(self, cutoff: float):
+        if self._date_order is None:
+            # NaN (undated) sorts last and is never inside a range
+            self._date_order = np.argsort(self.features.posted_ts, kind="stable")
+            self._dated = int(np.count_nonzero(~np.isnan(self.features.posted_ts)))
+        sorted_ts = self.features.posted_ts[self._date_order[:self._dated]]
+        start = np.searchsorted(sorted_ts, cutoff, side="left")
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self._date_order[start:self._dated]] = True
+        return self._pack(mask)
+
+    def _clause(self, key):
+        bitmap = self._clauses.get(key)
+        if bitmap is None:
+            kind, value = key
+            if kind == "remote":
+                bitmap = self._pack(self.features.remote == value)
+            elif kind == "locations":
+                bitmap = self._location_bitmap(value)
+            elif kind == "max_years":
+                bitmap = self._pack(self.features.min_years <= value)
+            else:
+                bitmap = self._recency_bitmap(value)
+            self._clauses[key] = bitmap
+        return bitmap
+
+    def _clause_keys(self, job_filter: JobFilter, now: Optional[datetime]):
+        keys = []
+        if job_filter.remote is not None:
+            keys.append(("remote", bool(job_filter.remote)))
+        if job_filter.locations:
+            keys.append(("locations", job_filter.locations))
+        if job_filter.max_years is not None:
+            keys.append(("max_years", job_filter.max_years))
+        if job_filter.posted_within_days is not None:
+            now_ts = ((now or datetime.utcnow()) - EPOCH).total_seconds()
+            cutoff = now_ts - job_filter.posted_within_days * SECONDS_PER_DAY
+            keys.append(("posted_after", cutoff // RECENCY_GRANULARITY * RECENCY_GRANULARITY))
+        return tuple(keys)
+
+    def bitmap(self, job_filter: JobFilter, now: Optional[datetime] = None):
+        """(packed bitmap of live rows passing the filter, number of such rows)"""
+        keys = self._clause_keys(job_filter, now)
+        with self._lock:
+            cached = self._combined.get(keys)
+            if cached is not None:
+                self._combined.move_to_end(keys)
+                self.hits += 1
+                return cached
+            self.misses += 1
+            bitmap = self._alive
+            for key in keys:
+                bitmap = np.bitwise_and(bitmap, self._clause(key))
+            count = int(np.count_nonzero(self.unpack(bitmap)))
+            self._combined[keys] = (bitmap, count)
+            while len(self._combined) > FILTER_CACHE_SIZE:
+                self._combined.popitem(last=False)
+            return bitmap, count
+
+    def stats(self):
+        return {
+            "rows": self.n,
+            "cached_filters": len(self._combined),
+            "cached_clauses": len(self._clauses),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
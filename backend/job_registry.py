@@ -0,0 +1,441 @@
+# backend/job_registry.py
+import hashlib
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from embedding_buffer import EmbeddingBuffer
+from embedding_cache import normalize_text
+from job_filters import FilterIndex
+from quantization import EmbeddingCodec, REFIT_UNTIL_ROWS
+from reranker import JobFeatures, EPOCH, SECONDS_PER_DAY, normalize_posted_dates
+
+# Compact once this share of rows is tombstoned
+COMPACT_RATIO = float(os.getenv("JOB_COMPACT_RATIO", "0.25"))
+# Rows encoded per step when loading a float32 matrix into compact form
+ENCODE_CHUNK_ROWS = 65536
+
+# Consistent, read-only view of the registry. Readers grab one per request
+# and never see a half-applied ingest.
+IndexSnapshot = namedtuple(
+    "IndexSnapshot",
+    ["version", "jobs", "embeddings", "features", "alive", "index", "live_count", "filters",
+     "title_codes", "title_vectors", "codec"]
+)
+
+
+def content_hash(text: str) -> str:
+    """Digest of an embedding input; equal digests mean the vector can be reused"""
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class TitleVocabulary:
+    """Distinct normalized job titles and their embeddings.
+
+    Rows point at a title by code, so title similarity for a set of
+    candidates is one gather plus a dot product and a title shared by many
+    postings is encoded once. Vectors come from the store when it has them.
+    """
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.buffer = EmbeddingBuffer()
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        return self.buffer.view()
+
+    def unseen(self, jobs: List[Dict], embed_fn, store=None) -> Dict[str, np.ndarray]:
+        """Vectors for the titles of jobs not in the vocabulary yet, without adding them"""
+        titles = dict.fromkeys(normalize_text(job.get("title")) for job in jobs)
+        return self._vectors([t for t in titles if t not in self.codes], embed_fn, store)
+
+    @staticmethod
+    def _vectors(new: List[str], embed_fn, store=None) -> Dict[str, np.ndarray]:
+        if not new:
+            return {}
+        found = store.load_title_embeddings(new) if store is not None else {}
+        missing = [t for t in new if t not in found]
+        if missing:
+            embs = np.asarray(embed_fn(missing), dtype=np.float32)
+            found.update(zip(missing, embs))
+            if store is not None:
+                store.save_title_embeddings(missing, embs)
+        return found
+
+    def encode(self, jobs: List[Dict], embed_fn, store=None,
+               prepared: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        """Title codes for jobs, encoding titles not seen before.
+
+        prepared may hold vectors already fetched with unseen().
+        """
+        titles = [normalize_text(job.get("title")) for job in jobs]
+        new = [t for t in dict.fromkeys(titles) if t not in self.codes]
+        if new:
+            found = dict(prepared or {})
+            found.update(self._vectors([t for t in new if t not in found], embed_fn, store))
+            start = self.buffer.append(np.stack([found[t] for t in new]))
+            for offset, title in enumerate(new):
+                self.codes[title] = start + offset
+        return np.fromiter((self.codes[t] for t in titles), dtype=np.int64, count=len(titles))
+
+
+class JobRegistry:
+    """In-memory job table with a primary-key index.
+
+    Keeps the job rows, their embeddings, the re-ranking feature columns and
+    the vector index aligned row-for-row through inserts, updates, deletes
+    and expiry. Rows are append-only: updates and deletes tombstone the old
+    row, and tombstoned rows are dropped in bulk once they pile up.
+
+    Each row also carries a content hash of its text_fn output. Postings
+    whose text hashes to a vector already in the buffer reuse it instead of
+    going back to the encoder.
+
+    With a compact codec the buffer holds float16 or int8 codes rather than
+    float32; the store keeps full precision on disk for rescoring.
+
+    With encode_titles off (no scoring profile weights titles) titles aren't
+    embedded at all; every row gets title code 0 and snapshots carry no
+    title vectors, which scores titles as neutral.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], np.ndarray],
+                 text_fn: Callable[[Dict], str],
+                 index_factory: Optional[Callable[..., object]] = None,
+                 store=None, codec: Optional[EmbeddingCodec] = None, encode_titles: bool = True):
+        self.embed_fn = embed_fn
+        self.text_fn = text_fn
+        self.index_factory = index_factory
+        # Optional JobStore that every change is written through to
+        self.store = store
+        self.jobs: List[Dict] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.hashes: List[str] = []
+        self.hash_to_row: Dict[str, int] = {}
+        self.codec = codec or EmbeddingCodec()
+        self.buffer = EmbeddingBuffer(dtype=self.codec.dtype)
+        self.features = JobFeatures()
+        self.encode_titles = encode_titles
+        self.titles = TitleVocabulary()
+        self.title_codes = np.zeros(0, dtype=np.int64)
+        self.index = None
+        self.version = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.id_to_row)
+
+    def __contains__(self, job_id: str):
+        return job_id in self.id_to_row
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        return self.buffer.view()
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self.buffer.alive()
+
+    def load_from_store(self, index_loader: Optional[Callable[[np.ndarray, List[Dict]], object]] = None) -> int:
+        """Replace the in-memory state with the persisted jobs.
+
+        Embeddings stay memory-mapped until the first append. index_loader
+        may return a previously saved index matching the loaded rows, in
+        which case the vectors aren't re-added.
+        """
+        if self.store is None:
+            return 0
+        with self._lock:
+            jobs, embeddings = self.store.load_jobs()
+            self.jobs = jobs
+            self.id_to_row = {job["id"]: row for row, job in enumerate(jobs)}
+            # Rows saved before hashes were stored get them backfilled here
+            stored = self.store.content_hashes()
+            self.hashes = [stored.get(job["id"]) or content_hash(self.text_fn(job)) for job in jobs]
+            self.hash_to_row = {h: row for row, h in enumerate(self.hashes)}
+            # Dates were parsed when the jobs were ingested
+            stored_ts = self.store.posted_timestamps()
+            posted_ts = np.array([stored_ts.get(job["id"], np.nan) for job in jobs], dtype=np.float64)
+            self.features = JobFeatures()
+            self.features.append(jobs, posted_ts)
+            self.titles = TitleVocabulary()
+            self.title_codes = self._title_codes(jobs)
+            if embeddings is None:
+                self.buffer = EmbeddingBuffer(dtype=self.codec.dtype)
+            elif not self.codec.compact:
+                self.buffer = EmbeddingBuffer.from_array(embeddings)
+            else:
+                self.codec = self.codec.fit(embeddings)
+                self.buffer = EmbeddingBuffer(dim=embeddings.shape[1], capacity=len(embeddings),
+                                              dtype=self.codec.dtype)
+                for start in range(0, len(embeddings), ENCODE_CHUNK_ROWS):
+                    self.buffer.append(self.codec.encode(embeddings[start:start + ENCODE_CHUNK_ROWS]))
+            self.index = index_loader(self.embeddings, jobs) if index_loader and jobs else None
+            if self.index is None:
+                self._rebuild_index()
+            return len(jobs)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self.id_to_row.get(job_id)
+        return self.jobs[row] if row is not None else None
+
+    def upsert(self, jobs: Iterable[Dict]):
+        """Insert new jobs and update changed ones, encoding only unseen text.
+
+        Text the registry has no vector for is encoded before the lock is
+        taken, so snapshot() and other writers never wait on the model.
+        """
+        # Later duplicates in the same batch win
+        batch = {j["id"]: j for j in jobs}
+        texts = {job_id: self.text_fn(job) for job_id, job in batch.items()}
+        digests = {job_id: content_hash(text) for job_id, text in texts.items()}
+        # Unlocked lookups are only a hint: text that still has no vector once
+        # the lock is held (e.g. its row was compacted away meanwhile) is
+        # encoded under the lock below
+        unseen = {}
+        for job_id, digest in digests.items():
+            if digest not in self.hash_to_row:
+                unseen.setdefault(digest, texts[job_id])
+        encoded = {}
+        if unseen:
+            encoded = dict(zip(unseen, np.asarray(self.embed_fn(list(unseen.values())), dtype=np.float32)))
+        titles = self.titles.unseen(list(batch.values()), self.embed_fn, self.store) if self.encode_titles else {}
+
+        with self._lock:
+            to_write, hashes, replaced_rows = [], [], []
+            to_encode: Dict[str, str] = {}
+            unchanged = 0
+            for job_id, job in batch.items():
+                row = self.id_to_row.get(job_id)
+                if row is not None and self.jobs[row] == job:
+                    unchanged += 1
+                    continue
+                digest = digests[job_id]
+                if digest not in encoded and digest not in self.hash_to_row:
+                    to_encode.setdefault(digest, texts[job_id])
+                to_write.append(job)
+                hashes.append(digest)
+                if row is not None:
+                    replaced_rows.append(row)
+
+            if not to_write:
+                return {"ingested": 0, "updated": 0, "unchanged": unchanged, "embedded": 0, "reused": 0,
+                        "unparseable_dates": 0}
+
+            # Date normalization stage: parse once here, never per request
+            posted_ts, unparseable = normalize_posted_dates(to_write)
+            if unparseable:
+                examples = ", ".join(f"{to_write[i]['id']}={to_write[i].get('postedDate')!r}"
+                                     for i in unparseable[:5])
+                print(f"{len(unparseable)} jobs have unparseable postedDate values, e.g. {examples}")
+
+            if to_encode:
+                new_embs = np.asarray(self.embed_fn(list(to_encode.values())), dtype=np.float32)
+                encoded.update(zip(to_encode, new_embs))
+            reused = self._reused_vectors({h: self.hash_to_row[h] for h in hashes if h not in encoded})
+            embs = np.stack([encoded[h] if h in encoded else reused[h] for h in hashes]).astype(np.float32, copy=False)
+
+            if self.store is not None:
+                self.store.save_jobs(to_write, embs, hashes, posted_ts)
+            self.buffer.tombstone(replaced_rows)
+            self._append(to_write, embs, hashes, posted_ts, titles)
+            self._maybe_compact()
+
+            embedded = len({h for h in hashes if h in encoded})
+            return {
+                "ingested": len(to_write) - len(replaced_rows),
+                "updated": len(replaced_rows),
+                "unchanged": unchanged,
+                "embedded": embedded,
+                "reused": len(to_write) - embedded,
+                "unparseable_dates": len(unparseable)
+            }
+
+    def _reused_vectors(self, rows: Dict[str, int]) -> Dict[str, np.ndarray]:
+        """hash -> float32 vector of the existing row it maps to.
+
+        Tombstoned rows keep their codes until compaction, so every row is
+        readable. With a compact codec, live rows are read from the store's
+        float32 matrix instead, so the store is never handed a decoded copy;
+        a tombstoned row's id may point at other text there by now.
+        """
+        if not rows:
+            return {}
+        positions = list(rows.values())
+        vectors = self.codec.decode(self.embeddings[positions])
+        if self.store is not None and self.codec.compact:
+            live = {}
+            for pos, row in enumerate(positions):
+                job_id = self.jobs[row]["id"]
+                if self.id_to_row.get(job_id) == row:
+                    live[job_id] = pos
+            for job_id, vector in self.store.load_embeddings(list(live)).items():
+                vectors[live[job_id]] = vector
+        return dict(zip(rows, vectors))
+
+    def _append(self, jobs: List[Dict], embs: np.ndarray, hashes: List[str], posted_ts: np.ndarray,
+                titles: Optional[Dict[str, np.ndarray]] = None):
+        self._maybe_refit(embs)
+        start = self.buffer.append(self.codec.encode(embs))
+        self.jobs.extend(jobs)
+        self.hashes.extend(hashes)
+        for offset, (job, digest) in enumerate(zip(jobs, hashes)):
+            self.id_to_row[job["id"]] = start + offset
+            self.hash_to_row[digest] = start + offset
+        self.features.append(jobs, posted_ts)
+        self.title_codes = np.concatenate([self.title_codes, self._title_codes(jobs, titles)])
+        if self.index is None:
+            self._rebuild_index()
+        else:
+            # Added in place: published snapshots bound their searches to
+            # their own row count, and a rebuild swaps in a new index object
+            self.index.add(embs)
+            # e.g. an IVF index that has just crossed its training threshold
+            if getattr(self.index, "needs_rebuild", False):
+                self._rebuild_index()
+
+    def _title_codes(self, jobs: List[Dict], prepared: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        if not self.encode_titles:
+            return np.zeros(len(jobs), dtype=np.int64)
+        return self.titles.encode(jobs, self.embed_fn, self.store, prepared)
+
+    def _maybe_refit(self, embs: np.ndarray):
+        """Fit int8 scales on the first rows and refit while the corpus is small.
+
+        Scales fitted on a handful of postings would clip later ones, so
+        until REFIT_UNTIL_ROWS rows they are refit whenever the corpus has
+        doubled. Rows are re-encoded into a fresh buffer; published
+        snapshots keep their codes and the codec they were encoded with.
+        """
+        if self.codec.precision != "int8":
+            return
+        if self.codec.fitted and (self.codec.fitted_rows >= REFIT_UNTIL_ROWS or
+                                  len(self.buffer) + len(embs) < 2 * self.codec.fitted_rows):
+            return
+        current = self.embeddings
+        old = self.codec.decode(current) if current is not None else np.zeros((0, embs.shape[1]), np.float32)
+        self.codec = self.codec.fit(np.concatenate([old, embs]))
+        alive = self.alive.copy()
+        self.buffer = EmbeddingBuffer(dim=embs.shape[1], dtype=self.codec.dtype)
+        if len(old):
+            self.buffer.append(self.codec.encode(old))
+            self.buffer.tombstone(np.flatnonzero(~alive))
+
+    def full_vectors(self, jobs: List[Dict], rows: np.ndarray, codes: np.ndarray,
+                     codec: EmbeddingCodec) -> np.ndarray:
+        """float32 vectors for rows of a snapshot, for rescoring compact scores.
+
+        Read from the store's float32 matrix; rows the store no longer has
+        (and every row when there is no store) are decoded from `codes`.
+        """
+        vectors = codec.decode(codes[rows])
+        if self.store is None or not codec.compact:
+            return vectors
+        stored = self.store.load_embeddings([jobs[row]["id"] for row in rows])
+        for pos, row in enumerate(rows):
+            vector = stored.get(jobs[row]["id"])
+            if vector is not None:
+                vectors[pos] = vector
+        return vectors
+
+    def delete(self, job_ids: Iterable[str]) -> int:
+        """Remove jobs by id"""
+        with self._lock:
+            ids = [i for i in set(job_ids) if i in self.id_to_row]
+            if not ids:
+                return 0
+            if self.store is not None:
+                self.store.delete_jobs(ids)
+            rows = [self.id_to_row.pop(i) for i in ids]
+            self.buffer.tombstone(rows)
+            self._maybe_compact()
+            return len(rows)
+
+    def expire(self, max_age_days: float, now: Optional[datetime] = None) -> int:
+        """Delete postings older than max_age_days; undated postings are kept"""
+        with self._lock:
+            if not self.id_to_row:
+                return 0
+            now_ts = ((now or datetime.utcnow()) - EPOCH).total_seconds()
+            cutoff = now_ts - max_age_days * SECONDS_PER_DAY
+            expired = np.flatnonzero(self.alive & (self.features.posted_ts < cutoff))
+            if not len(expired):
+                return 0
+            ids = [self.jobs[row]["id"] for row in expired]
+            if self.store is not None:
+                self.store.delete_jobs(ids)
+            for job_id in ids:
+                del self.id_to_row[job_id]
+            self.buffer.tombstone(expired)
+            self._maybe_compact()
+            return len(expired)
+
+    def _maybe_compact(self):
+        if self.buffer.tombstone_ratio > COMPACT_RATIO:
+            self.compact()
+
+    def compact(self):
+        """Drop tombstoned rows from every aligned structure and rebuild the index"""
+        with self._lock:
+            keep = self.buffer.compact()
+            self.jobs = [job for job, k in zip(self.jobs, keep) if k]
+            self.hashes = [h for h, k in zip(self.hashes, keep) if k]
+            self.id_to_row = {job["id"]: row for row, job in enumerate(self.jobs)}
+            self.hash_to_row = {h: row for row, h in enumerate(self.hashes)}
+            self.features.keep(keep)
+            self.title_codes = self.title_codes[keep]
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        if self.index_factory is None or not len(self.buffer):
+            self.index = None
+        else:
+            self.index = self.index_factory(self.embeddings, self.codec.decode)
+
+    def snapshot(self) -> IndexSnapshot:
+        """Capture the current state for lock-free readers"""
+        with self._lock:
+            self.version += 1
+            features = self.features.copy()
+            alive = self.alive.copy()
+            return IndexSnapshot(
+                version=self.version,
+                jobs=self.jobs,
+                embeddings=self.embeddings,
+                features=features,
+                alive=alive,
+                index=self.index,
+                live_count=len(self),
+                # Filter bitmaps are built lazily and live as long as the snapshot
+                filters=FilterIndex(features, alive),
+                title_codes=self.title_codes,
+                title_vectors=self.titles.vectors,
+                codec=self.codec
+            )
+
+    def fingerprint(self, jobs: Optional[List[Dict]] = None) -> str:
+        """Digest of the row order, used to match a saved index to these rows"""
+        digest = hashlib.sha1()
+        for job in self.jobs if jobs is None else jobs:
+            digest.update(job["id"].encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def stats(self):
+        return {
+            "jobs": len(self),
+            "rows": len(self.buffer),
+            "tombstones": self.buffer.tombstones,
+            "capacity": self.buffer.capacity,
+            "distinct_titles": len(self.titles),
+            "memory_mapped": isinstance(self.embeddings, np.memmap),
+            **self.codec.describe(len(self.buffer), self.buffer.dim or 0),
+        }
@@ -1,16 +1,94 @@
 # backend/job_store.py
 import json
+import os
 import sqlite3
-from typing import List, Dict
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import Any, List, Dict, Iterable, Iterator, Optional, Sequence
 import numpy as np
 
+from reranker import posted_timestamp
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+JOB_COLUMNS = ('id', 'title', 'company', 'location', 'description', 'requiredSkills',
+               'url', 'minYearsExperience', 'remote', 'postedDate')
+
+# Applied to every connection: WAL lets readers run alongside the writer and
+# NORMAL sync is durable across application crashes in WAL mode
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA busy_timeout=30000',
+)
+
+# Stay below SQLite's bound-parameter limit on older builds
+LOOKUP_CHUNK = 500
+# Reads retried when a compaction swaps the matrix file out from under them
+MATRIX_OPEN_ATTEMPTS = 5
+
+# One page of iter_jobs: job dicts, their embeddings (or None) and the rowid
+# to pass as after_rowid to resume after this page
+JobChunk = namedtuple('JobChunk', ['jobs', 'embeddings', 'last_rowid'])
+
+
 class JobStore:
+    """SQLite job table plus a raw float32 embedding matrix next to it.
+
+    Rows in the matrix file are referenced by the `emb_row` column. The file
+    is append-only between compactions and is opened with np.memmap, so a
+    restarted worker doesn't rebuild the matrix row by row and several
+    workers on one host share a single page-cached copy.
+
+    Compaction writes a new generation of the file and switches `emb_row`
+    and the generation recorded in `meta` in one transaction, so the rows
+    and the file they point into always change together.
+    """
+
     def __init__(self, db_path="jobs.db"):
         self.db_path = db_path
+        self.base_path = os.path.splitext(db_path)[0]
+        self.lock_path = self.base_path + ".embeddings.f32.lock"
+        self._local = threading.local()
         self._init_db()
-    
+
+    def _connection(self) -> sqlite3.Connection:
+        """Long-lived connection for the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connection()
         conn.execute('''
             CREATE TABLE IF NOT EXISTS jobs (
                 id TEXT PRIMARY KEY,
@@ -23,55 +101,474 @@ class JobStore:
                 minYearsExperience INTEGER,
                 remote BOOLEAN,
                 postedDate TEXT,
-                embedding BLOB
+                embedding BLOB,
+                emb_row INTEGER,
+                content_hash TEXT,
+                posted_ts REAL
             )
         ''')
-        conn.commit()
-        conn.close()
-    
-    def save_jobs(self, jobs: List[Dict], embeddings: np.ndarray):
-        conn = sqlite3.connect(self.db_path)
-        for job, embedding in zip(jobs, embeddings):
-            conn.execute('''
-                INSERT OR REPLACE INTO jobs 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                job['id'],
-                job['title'],
-                job['company'],
-                job['location'],
-                job['description'],
-                json.dumps(job['requiredSkills']),
-                job['url'],
-                job['minYearsExperience'],
-                job['remote'],
-                job['postedDate'],
-                embedding.tobytes()
-            ))
-        conn.commit()
-        conn.close()
-    
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'emb_row' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN emb_row INTEGER')
+        if 'content_hash' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN content_hash TEXT')
+        if 'posted_ts' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN posted_ts REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_posted_ts ON jobs (posted_ts)')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('CREATE TABLE IF NOT EXISTS title_embeddings (title TEXT PRIMARY KEY, vector BLOB)')
+        self._migrate_blobs()
+        self._backfill_posted_ts()
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize matrix appends across worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _read_view(self):
+        """Read transaction: every query inside sees the same committed state"""
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.execute('COMMIT')
+
+    def _get_meta(self, conn, key):
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _generation_path(self, generation: int) -> str:
+        # Generation 0 keeps the name used before compaction was generational
+        if generation == 0:
+            return self.base_path + ".embeddings.f32"
+        return f"{self.base_path}.embeddings.{generation}.f32"
+
+    def _generation(self, conn) -> int:
+        return int(self._get_meta(conn, 'matrix_generation') or 0)
+
+    def _matrix_file(self, conn) -> str:
+        """Matrix file the rows visible to conn point into"""
+        return self._generation_path(self._generation(conn))
+
+    @property
+    def matrix_path(self) -> str:
+        return self._matrix_file(self._connection())
+
+    @property
+    def dim(self) -> Optional[int]:
+        value = self._get_meta(self._connection(), 'dim')
+        return int(value) if value else None
+
+    @staticmethod
+    def _matrix_rows(path: str, dim: int) -> int:
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (dim * 4)
+
+    def _append_matrix(self, conn, embeddings: np.ndarray) -> int:
+        """Append rows to the matrix file and return the first row number"""
+        dim = embeddings.shape[1]
+        stored_dim = self._get_meta(conn, 'dim')
+        if stored_dim is None:
+            conn.execute('INSERT INTO meta VALUES (?, ?)', ('dim', str(dim)))
+        elif int(stored_dim) != dim:
+            raise ValueError(f"Store holds {stored_dim}-dimensional embeddings, got {dim}")
+        path = self._matrix_file(conn)
+        start = self._matrix_rows(path, dim)
+        with open(path, 'ab') as f:
+            f.truncate(start * dim * 4)
+            f.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+        return start
+
+    def _migrate_blobs(self):
+        """Move embeddings from the old per-row BLOB column into the matrix file"""
+        rows = self._connection().execute(
+            'SELECT id, embedding FROM jobs WHERE emb_row IS NULL AND embedding IS NOT NULL'
+        ).fetchall()
+        if rows:
+            with self._exclusive(), self._transaction() as conn:
+                embeddings = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                start = self._append_matrix(conn, embeddings)
+                conn.executemany(
+                    'UPDATE jobs SET emb_row = ?, embedding = NULL WHERE id = ?',
+                    [(start + i, job_id) for i, (job_id, _) in enumerate(rows)]
+                )
+            print(f"Migrated {len(rows)} embeddings to {self.matrix_path}")
+
+    def _backfill_posted_ts(self):
+        """Parse postedDate for rows stored before posted_ts existed"""
+        rows = self._connection().execute(
+            "SELECT id, postedDate FROM jobs WHERE posted_ts IS NULL AND postedDate IS NOT NULL AND postedDate != ''"
+        ).fetchall()
+        parsed = [(posted_timestamp(date), job_id) for job_id, date in rows]
+        parsed = [(ts, job_id) for ts, job_id in parsed if not np.isnan(ts)]
+        if parsed:
+            with self._transaction() as conn:
+                conn.executemany('UPDATE jobs SET posted_ts = ? WHERE id = ?', parsed)
+            print(f"Backfilled posted_ts for {len(parsed)} jobs")
+
+    def _job_values(self, job: Dict) -> tuple:
+        return (
+            job['id'],
+            job['title'],
+            job.get('company'),
+            job.get('location'),
+            job.get('description'),
+            json.dumps(job.get('requiredSkills') or []),
+            job.get('url'),
+            job.get('minYearsExperience'),
+            None if job.get('remote') is None else int(bool(job.get('remote'))),
+            self._date_text(job.get('postedDate'))
+        )
+
+    def _existing_rows(self, conn, ids: List[str]) -> Dict[str, tuple]:
+        """id -> (job column values, content_hash, emb_row) for stored ids"""
+        existing = {}
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[start:start + LOOKUP_CHUNK]
+            rows = conn.execute(
+                f'SELECT {", ".join(JOB_COLUMNS)}, content_hash, emb_row FROM jobs '
+                f'WHERE id IN ({", ".join("?" * len(chunk))})',
+                chunk
+            )
+            for row in rows:
+                existing[row[0]] = (tuple(row[:len(JOB_COLUMNS)]), row[-2], row[-1])
+        return existing
+
+    def save_jobs(self, jobs: List[Dict], embeddings: np.ndarray,
+                  content_hashes: Optional[Sequence[str]] = None,
+                  posted_ts: Optional[Sequence[float]] = None) -> Dict[str, int]:
+        """Upsert jobs in one transaction.
+
+        Rows identical to what is stored are left alone and their embeddings
+        aren't appended again. content_hashes, aligned with jobs, are digests
+        of the embedding input; an updated row whose digest matches the
+        stored one keeps its existing matrix row. posted_ts are the parsed
+        posting times (NaN if unknown); they are parsed here when omitted.
+        Returns counts of inserted, updated and unchanged rows.
+        """
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+        if not jobs:
+            return counts
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if content_hashes is None:
+            content_hashes = [None] * len(jobs)
+        if posted_ts is None:
+            posted_ts = [posted_timestamp(job.get('postedDate')) for job in jobs]
+
+        # Later duplicates in the same batch win
+        latest = {job['id']: i for i, job in enumerate(jobs)}
+        positions = sorted(latest.values())
+        values = [self._job_values(jobs[i]) for i in positions]
+
+        with self._exclusive(), self._transaction() as conn:
+            existing = self._existing_rows(conn, [v[0] for v in values])
+            inserts, updates, append_positions = [], [], []
+            emb_rows = {}
+            for pos, row in zip(positions, values):
+                digest = content_hashes[pos]
+                # SQLite stores NaN as NULL anyway; be explicit
+                ts = None if np.isnan(posted_ts[pos]) else float(posted_ts[pos])
+                old = existing.get(row[0])
+                if old is None:
+                    inserts.append(row + (digest, ts))
+                else:
+                    old_row, old_digest, old_emb_row = old
+                    if old_row == row and (digest is None or digest == old_digest):
+                        counts["unchanged"] += 1
+                        continue
+                    updates.append(row + (digest, ts))
+                    if digest is not None and digest == old_digest and old_emb_row is not None:
+                        # Same embedding input: point at the vector already on disk
+                        emb_rows[row[0]] = old_emb_row
+                        continue
+                append_positions.append(pos)
+
+            if append_positions:
+                start = self._append_matrix(conn, embeddings[append_positions])
+                for i, pos in enumerate(append_positions):
+                    emb_rows[jobs[pos]['id']] = start + i
+            conn.executemany(
+                f'INSERT INTO jobs ({", ".join(JOB_COLUMNS)}, content_hash, posted_ts, emb_row) '
+                f'VALUES ({", ".join("?" * (len(JOB_COLUMNS) + 3))})',
+                [row + (emb_rows[row[0]],) for row in inserts]
+            )
+            conn.executemany(
+                f'UPDATE jobs SET {", ".join(c + " = ?" for c in JOB_COLUMNS[1:])}, '
+                'content_hash = ?, posted_ts = ?, emb_row = ?, embedding = NULL WHERE id = ?',
+                [row[1:] + (emb_rows[row[0]], row[0]) for row in updates]
+            )
+            counts["inserted"] = len(inserts)
+            counts["updated"] = len(updates)
+        return counts
+
+    def load_title_embeddings(self, titles: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings for the given normalized titles"""
+        conn = self._connection()
+        found = {}
+        for start in range(0, len(titles), LOOKUP_CHUNK):
+            chunk = titles[start:start + LOOKUP_CHUNK]
+            rows = conn.execute(
+                f'SELECT title, vector FROM title_embeddings WHERE title IN ({", ".join("?" * len(chunk))})',
+                chunk
+            )
+            for title, blob in rows:
+                found[title] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def save_title_embeddings(self, titles: List[str], embeddings: np.ndarray):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO title_embeddings VALUES (?, ?)',
+                [(title, embeddings[i].tobytes()) for i, title in enumerate(titles)]
+            )
+
+    def load_embeddings(self, job_ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """id -> float32 embedding read from the matrix file, for stored ids.
+
+        The row lookup and the read share one read view, so a concurrent
+        compaction can't renumber rows between them.
+        """
+        def read(conn, matrix):
+            if matrix is None:
+                return {}
+            ids, emb_rows = [], []
+            for start in range(0, len(job_ids), LOOKUP_CHUNK):
+                chunk = list(job_ids[start:start + LOOKUP_CHUNK])
+                for job_id, emb_row in conn.execute(
+                    f'SELECT id, emb_row FROM jobs WHERE emb_row IS NOT NULL AND id IN ({", ".join("?" * len(chunk))})',
+                    chunk
+                ):
+                    if emb_row < len(matrix):
+                        ids.append(job_id)
+                        emb_rows.append(emb_row)
+            vectors = np.asarray(matrix[np.asarray(emb_rows, dtype=np.int64)])
+            return dict(zip(ids, vectors))
+
+        return self._with_matrix(read)
+
+    def job_ids(self) -> List[str]:
+        """Ids of the stored jobs in the order load_jobs returns them"""
+        return [row[0] for row in self._connection().execute(
+            'SELECT id FROM jobs WHERE emb_row IS NOT NULL ORDER BY emb_row')]
+
+    def content_hashes(self) -> Dict[str, Optional[str]]:
+        """id -> stored digest of the embedding input (None for legacy rows)"""
+        return dict(self._connection().execute('SELECT id, content_hash FROM jobs'))
+
+    def posted_timestamps(self) -> Dict[str, float]:
+        """id -> posting time in UTC epoch seconds, for rows with a usable date"""
+        return dict(self._connection().execute('SELECT id, posted_ts FROM jobs WHERE posted_ts IS NOT NULL'))
+
+    @staticmethod
+    def _date_text(value):
+        return None if value is None else str(value)
+
+    def delete_jobs(self, job_ids: Iterable[str]) -> int:
+        """Delete rows; their matrix rows are reclaimed by compact()"""
+        with self._transaction() as conn:
+            cursor = conn.executemany('DELETE FROM jobs WHERE id = ?', [(i,) for i in job_ids])
+            return cursor.rowcount
+
+    def _decode(self, columns: Sequence[str], row) -> Dict:
+        job = dict(zip(columns, row))
+        if 'requiredSkills' in job:
+            job['requiredSkills'] = json.loads(job['requiredSkills']) if job['requiredSkills'] else []
+        if 'remote' in job:
+            job['remote'] = bool(job['remote'])
+        return job
+
+    def iter_jobs(self, chunk_size: int = 5000, columns: Optional[Sequence[str]] = None,
+                  with_embeddings: bool = True, posted_after: Optional[Any] = None,
+                  posted_before: Optional[Any] = None, location: Optional[str] = None,
+                  after_rowid: int = 0) -> Iterator[JobChunk]:
+        """Stream jobs in rowid order, chunk_size rows at a time.
+
+        `columns` projects the job fields (id is always included), so e.g.
+        columns=['id'] streams just ids and embeddings. Date and location
+        filters run in SQL; date bounds (dates, ISO strings or epoch seconds)
+        compare against the indexed posted_ts column and location is a
+        case-insensitive substring match. Pages are fetched by keyset on
+        rowid, so memory stays at one chunk and an interrupted scan can
+        resume from the last chunk's last_rowid.
+        """
+        columns = list(columns) if columns else list(JOB_COLUMNS)
+        unknown = set(columns) - set(JOB_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job columns: {sorted(unknown)}")
+        if 'id' not in columns:
+            columns.insert(0, 'id')
+
+        where, params = ['rowid > ?'], []
+        if with_embeddings:
+            where.append('emb_row IS NOT NULL')
+        if posted_after is not None:
+            where.append('posted_ts >= ?')
+            params.append(self._bound(posted_after))
+        if posted_before is not None:
+            where.append('posted_ts < ?')
+            params.append(self._bound(posted_before))
+        if location:
+            where.append("lower(location) LIKE ? ESCAPE '\\'")
+            escaped = location.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        sql = (f'SELECT rowid, emb_row, {", ".join(columns)} FROM jobs '
+               f'WHERE {" AND ".join(where)} ORDER BY rowid LIMIT ?')
+
+        def read_page(conn, matrix):
+            rows = conn.execute(sql, [last_rowid] + params + [chunk_size]).fetchall()
+            embeddings = None
+            if rows and with_embeddings:
+                # emb_row and the mapped generation come from the same commit,
+                # even if a compaction renumbered rows since the last page
+                emb_rows = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+                embeddings = np.asarray(matrix[emb_rows])
+            return rows, embeddings
+
+        conn = self._connection()
+        last_rowid = after_rowid
+        while True:
+            if with_embeddings:
+                rows, embeddings = self._with_matrix(read_page)
+            else:
+                rows, embeddings = conn.execute(sql, [last_rowid] + params + [chunk_size]).fetchall(), None
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            jobs = [self._decode(columns, row[2:]) for row in rows]
+            yield JobChunk(jobs, embeddings, last_rowid)
+
+            if len(rows) < chunk_size:
+                return
+
+    @staticmethod
+    def _bound(value) -> float:
+        ts = posted_timestamp(value)
+        if np.isnan(ts):
+            raise ValueError(f"Unparseable date bound {value!r}")
+        return ts
+
+    def _row_to_job(self, row):
+        return {
+            'id': row[0],
+            'title': row[1],
+            'company': row[2],
+            'location': row[3],
+            'description': row[4],
+            'requiredSkills': json.loads(row[5]) if row[5] else [],
+            'url': row[6],
+            'minYearsExperience': row[7],
+            'remote': bool(row[8]),
+            'postedDate': row[9]
+        }
+
+    def _map_matrix(self, conn) -> Optional[np.ndarray]:
+        """Memory map of the matrix generation visible to conn.
+
+        Raises FileNotFoundError if a compaction committed since conn's
+        read began and the file is already gone; callers retry in a fresh
+        read view.
+        """
+        dim = self._get_meta(conn, 'dim')
+        if dim is None:
+            return None
+        dim = int(dim)
+        path = self._matrix_file(conn)
+        rows = self._matrix_rows(path, dim)
+        if rows == 0:
+            if self._generation(conn) and not os.path.exists(path):
+                raise FileNotFoundError(path)
+            return None
+        return np.memmap(path, dtype=np.float32, mode='r', shape=(rows, dim))
+
+    def _with_matrix(self, read_fn):
+        """read_fn(conn, matrix) inside a read view, retried if compaction
+        removes the mapped generation underneath it"""
+        for attempt in range(MATRIX_OPEN_ATTEMPTS):
+            try:
+                with self._read_view() as conn:
+                    return read_fn(conn, self._map_matrix(conn))
+            except FileNotFoundError:
+                if attempt == MATRIX_OPEN_ATTEMPTS - 1:
+                    raise
+
+    def open_matrix(self) -> Optional[np.ndarray]:
+        """Read-only memory map of the whole embedding file"""
+        return self._with_matrix(lambda conn, matrix: matrix)
+
     def load_jobs(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM jobs')
-        jobs = []
-        embeddings = []
-        for row in cursor.fetchall():
-            job = {
-                'id': row[0],
-                'title': row[1],
-                'company': row[2],
-                'location': row[3],
-                'description': row[4],
-                'requiredSkills': json.loads(row[5]),
-                'url': row[6],
-                'minYearsExperience': row[7],
-                'remote': bool(row[8]),
-                'postedDate': row[9]
-            }
-            jobs.append(job)
-            embedding = np.frombuffer(row[10], dtype=np.float32)
-            embeddings.append(embedding)
-        conn.close()
-        return jobs, np.array(embeddings) if embeddings else None
\ No newline at end of file
+        """Return all jobs and their embeddings, row-aligned.
+
+        When the stored rows cover the matrix file in order the embeddings are
+        the memory map itself; otherwise the file is compacted first so the
+        next start is zero-copy again.
+        """
+        def read(conn, matrix):
+            rows = conn.execute(
+                f'SELECT {", ".join(JOB_COLUMNS)}, emb_row FROM jobs WHERE emb_row IS NOT NULL ORDER BY emb_row'
+            ).fetchall()
+            return rows, matrix
+
+        rows, matrix = self._with_matrix(read)
+        if not rows:
+            return [], None
+
+        emb_rows = np.fromiter((row[10] for row in rows), dtype=np.int64, count=len(rows))
+        if matrix is None or len(matrix) != len(rows) or not np.array_equal(emb_rows, np.arange(len(rows))):
+            self.compact()
+            rows, matrix = self._with_matrix(read)
+
+        jobs = [self._row_to_job(row) for row in rows]
+        return jobs, matrix
+
+    def compact(self):
+        """Rewrite the matrix with only live rows, in emb_row order, as a new generation.
+
+        The new file is complete on disk before the transaction that points
+        emb_row and meta at it commits; the old file is removed only after
+        the commit. A crash in between leaves the old mapping intact.
+        """
+        with self._exclusive():
+            with self._transaction() as conn:
+                dim = self._get_meta(conn, 'dim')
+                rows = conn.execute(
+                    'SELECT id, emb_row FROM jobs WHERE emb_row IS NOT NULL ORDER BY emb_row'
+                ).fetchall()
+                if dim is None or not rows:
+                    return
+                dim = int(dim)
+                generation = self._generation(conn)
+                old_path = self._generation_path(generation)
+                new_path = self._generation_path(generation + 1)
+                old = np.memmap(old_path, dtype=np.float32, mode='r',
+                                shape=(self._matrix_rows(old_path, dim), dim))
+                live = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+                tmp_path = new_path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    # Copy in blocks to keep memory flat on large corpora
+                    for start in range(0, len(live), 65536):
+                        f.write(np.ascontiguousarray(old[live[start:start + 65536]]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                del old
+                os.replace(tmp_path, new_path)
+                conn.executemany('UPDATE jobs SET emb_row = ? WHERE id = ?',
+                                 [(i, job_id) for i, (job_id, _) in enumerate(rows)])
+                conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                             ('matrix_generation', str(generation + 1)))
+            # Readers that already mapped the old file keep their inode
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
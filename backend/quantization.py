@@ -0,0 +1,168 @@
+# backend/quantization.py
+import os
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+# Rows sampled to fit the int8 scales
+FIT_SAMPLE_ROWS = 100000
+# Scales fitted on fewer rows than this get refit as the corpus grows
+REFIT_UNTIL_ROWS = 10000
+INT8_MAX = 127
+
+
+class EmbeddingCodec:
+    """Compact in-memory form of the job embeddings.
+
+    float32 stores vectors as is. float16 halves them. int8 quantizes each
+    dimension symmetrically with its own scale (max |value| / 127), a
+    quarter of float32. Scores are computed on the compact form: for int8
+    the scales are folded into the query, so q . decode(c) == (q * s) . c
+    and rows never need decoding. Values outside the fitted range are
+    clipped and counted.
+    """
+
+    def __init__(self, precision: str = "float32", scales: Optional[np.ndarray] = None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision '{precision}', expected one of {PRECISIONS}")
+        self.precision = precision
+        self.dtype = np.dtype(precision)
+        self.scales = scales
+        # Rows the scales were fitted on
+        self.fitted_rows = 0 if scales is None else FIT_SAMPLE_ROWS
+        self.clipped = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("EMBEDDING_PRECISION", "float32"))
+
+    @property
+    def compact(self) -> bool:
+        return self.precision != "float32"
+
+    @property
+    def fitted(self) -> bool:
+        return self.precision != "int8" or self.scales is not None
+
+    def fit(self, embs: np.ndarray) -> "EmbeddingCodec":
+        """New codec with scales fitted to embs (a sample is enough)"""
+        codec = EmbeddingCodec(self.precision)
+        if self.precision == "int8" and len(embs):
+            sample = embs
+            if len(embs) > FIT_SAMPLE_ROWS:
+                sample = embs[np.sort(np.random.default_rng(0).choice(len(embs), FIT_SAMPLE_ROWS, replace=False))]
+            absmax = np.abs(np.asarray(sample, dtype=np.float32)).max(axis=0)
+            codec.scales = (np.maximum(absmax, 1e-6) / INT8_MAX).astype(np.float32)
+            codec.fitted_rows = len(sample)
+        return codec
+
+    def encode(self, embs: np.ndarray) -> np.ndarray:
+        embs = np.asarray(embs, dtype=np.float32)
+        if self.precision != "int8":
+            return embs.astype(self.dtype)
+        codes = np.rint(embs / self.scales)
+        clipped = np.abs(codes) > INT8_MAX
+        if clipped.any():
+            self.clipped += int(clipped.sum())
+            np.clip(codes, -INT8_MAX, INT8_MAX, out=codes)
+        return codes.astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        if self.precision != "int8":
+            return np.asarray(codes, dtype=np.float32)
+        return codes.astype(np.float32) * self.scales
+
+    def scale_queries(self, queries: np.ndarray) -> np.ndarray:
+        """Queries to multiply against encoded rows instead of decoded ones"""
+        queries = np.asarray(queries, dtype=np.float32)
+        return queries * self.scales if self.precision == "int8" else queries
+
+    def describe(self, rows: int = 0, dim: int = 0):
+        return {
+            "precision": self.precision,
+            "bytes_per_vector": self.dtype.itemsize * dim,
+            "memory_mb": round(rows * dim * self.dtype.itemsize / 1e6, 2),
+            "clipped_values": self.clipped,
+        }
+
+
+def rescore(queries: np.ndarray, idxs: np.ndarray, vectors_fn: Callable[[np.ndarray], np.ndarray], k: int):
+    """Re-rank a compact-score shortlist with full-precision vectors.
+
+    idxs is (queries x shortlist) row ids padded with -1; vectors_fn maps an
+    array of distinct row ids to their float32 vectors. Returns the top k
+    (row ids, scores) per query in the same padded layout.
+    """
+    queries = np.asarray(np.atleast_2d(queries), dtype=np.float32)
+    valid = idxs >= 0
+    rows, inverse = np.unique(idxs[valid], return_inverse=True)
+    scores = np.full(idxs.shape, -np.inf, dtype=np.float32)
+    if len(rows):
+        vectors = np.asarray(vectors_fn(rows), dtype=np.float32)
+        query_of = np.broadcast_to(np.arange(len(queries))[:, None], idxs.shape)[valid]
+        scores[valid] = np.einsum("nd,nd->n", queries[query_of], vectors[inverse])
+    k = min(k, idxs.shape[1])
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    top_idxs = np.take_along_axis(idxs, order, axis=1)
+    top_scores = np.take_along_axis(scores, order, axis=1)
+    top_idxs[np.isneginf(top_scores)] = -1
+    return top_idxs, top_scores
+
+
+def precision_report(embs: np.ndarray, queries: np.ndarray, k: int = 10,
+                     precisions: Sequence[str] = PRECISIONS, rescore_factor: int = 4) -> Dict:
+    """Recall@k and latency of compact exact search against float32.
+
+    For each precision the corpus is encoded, searched on the compact form,
+    and searched again with a rescore_factor * k shortlist rescored in
+    float32.
+    """
+    from vector_index import exact_search
+
+    embs = np.ascontiguousarray(embs, dtype=np.float32)
+    queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+    k = min(k, len(embs))
+
+    def timed(fn):
+        start = time.perf_counter()
+        result = fn()
+        return result, (time.perf_counter() - start) * 1000 / len(queries)
+
+    (_, truth), float32_ms = timed(lambda: exact_search(embs, queries, k))
+
+    def recall(found):
+        hits = sum(len(set(f[f >= 0].tolist()) & set(t[t >= 0].tolist())) for f, t in zip(found, truth))
+        return round(hits / truth.size, 4) if truth.size else 0.0
+
+    report = {"rows": len(embs), "dim": embs.shape[1], "queries": len(queries), "k": k,
+              "float32_ms_per_query": round(float32_ms, 3), "precisions": {}}
+    for precision in precisions:
+        codec = EmbeddingCodec(precision).fit(embs)
+        codes = codec.encode(embs)
+        (_, found), compact_ms = timed(lambda: exact_search(codes, queries, k, codec=codec))
+        shortlist = min(len(embs), k * rescore_factor)
+
+        def rescored():
+            _, ids = exact_search(codes, queries, shortlist, codec=codec)
+            return rescore(queries, ids, lambda rows: embs[rows], k)
+
+        (rescored_ids, _), rescored_ms = timed(rescored)
+        report["precisions"][precision] = {
+            **codec.describe(len(embs), embs.shape[1]),
+            "recall": recall(found),
+            "ms_per_query": round(compact_ms, 3),
+            "rescored_recall": recall(rescored_ids),
+            "rescored_ms_per_query": round(rescored_ms, 3),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    # Clustered unit vectors, closer to sentence embeddings than pure noise
+    centers = rng.standard_normal((200, 384)).astype(np.float32)
+    corpus = centers[rng.integers(0, 200, 100000)] + 0.6 * rng.standard_normal((100000, 384)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    print(precision_report(corpus, corpus[rng.choice(len(corpus), 200, replace=False)]))
@@ -0,0 +1,240 @@
+# backend/reranker.py
+import json
+import os
+import numpy as np
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from dateutil import parser as dateparser
+
+SCORE_COMPONENTS = ("skill", "experience", "title", "location", "recency")
+DEFAULT_WEIGHTS = {"skill": 0.55, "experience": 0.20, "title": 0.0, "location": 0.20, "recency": 0.05}
+DEFAULT_PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_profiles.json")
+
+# Title score when the user named no desired roles
+NEUTRAL_TITLE = 0.5
+# Location score of a non-remote job when the user or the job has no location
+NEUTRAL_LOCATION = 0.5
+# Recency score of a job without a usable posted date
+NEUTRAL_RECENCY = 0.5
+EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 86400.0
+
+
+def normalize_location(location: Optional[str]) -> str:
+    return (location or "").strip().lower()
+
+
+def posted_timestamp(d: Any) -> float:
+    """Parse a posted date into UTC epoch seconds, NaN if missing or unparseable.
+
+    ISO-8601 (what Adzuna and the store use) takes the fast path; anything
+    else goes through dateutil's fuzzy parser. Offsets are converted to UTC
+    and naive times are taken as UTC.
+    """
+    if d is None or d == "":
+        return np.nan
+    if isinstance(d, bool):
+        return np.nan
+    if isinstance(d, (int, float)):
+        return float(d)
+    if isinstance(d, datetime):
+        parsed = d
+    elif isinstance(d, str):
+        try:
+            parsed = datetime.fromisoformat(d.strip())
+        except ValueError:
+            try:
+                parsed = dateparser.parse(d)
+            except (ValueError, OverflowError):
+                return np.nan
+    else:
+        return np.nan
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return (parsed - EPOCH).total_seconds()
+
+
+def normalize_posted_dates(jobs: List[Dict]) -> Tuple[np.ndarray, List[int]]:
+    """Parse every job's postedDate once, at ingest.
+
+    Returns epoch seconds aligned with jobs (NaN where there is no usable
+    date) and the positions of jobs that had a postedDate that couldn't be
+    parsed, so callers can report them.
+    """
+    posted_ts = np.array([posted_timestamp(j.get("postedDate")) for j in jobs], dtype=np.float64)
+    unparseable = [
+        i for i in np.flatnonzero(np.isnan(posted_ts)).tolist()
+        if jobs[i].get("postedDate") not in (None, "")
+    ]
+    return posted_ts, unparseable
+
+
+def load_weight_profiles(path: str = DEFAULT_PROFILES_PATH) -> Dict[str, Dict[str, float]]:
+    """Read {"profile": {"component": weight, ...}} from JSON.
+
+    Missing components weigh 0; a "default" profile is always present.
+    """
+    profiles = {"default": dict(DEFAULT_WEIGHTS)}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            raw = json.load(f)
+        for name, weights in raw.items():
+            unknown = set(weights) - set(SCORE_COMPONENTS)
+            if unknown:
+                raise ValueError(f"Scoring profile '{name}' has unknown components {sorted(unknown)}")
+            profiles[name] = {c: float(weights.get(c, 0.0)) for c in SCORE_COMPONENTS}
+    return profiles
+
+
+WEIGHT_PROFILES = load_weight_profiles(os.getenv("SCORING_PROFILES_PATH", DEFAULT_PROFILES_PATH))
+DEFAULT_PROFILE = os.getenv("SCORING_PROFILE", "default")
+
+
+def weights_for(profile: Optional[str] = None) -> Dict[str, float]:
+    """Weights of a named profile; KeyError if it isn't configured"""
+    name = profile or DEFAULT_PROFILE
+    if name not in WEIGHT_PROFILES:
+        raise KeyError(f"Unknown scoring profile '{name}', expected one of {sorted(WEIGHT_PROFILES)}")
+    return WEIGHT_PROFILES[name]
+
+
+class JobFeatures:
+    """Column store of the per-job fields used for re-ranking.
+
+    Rows line up with JOB_STORE, so a search result index can be used to
+    gather every feature with a single fancy-indexing operation.
+    """
+
+    def __init__(self):
+        self.min_years = np.zeros(0, dtype=np.float32)
+        self.remote = np.zeros(0, dtype=bool)
+        self.location = np.zeros(0, dtype="<U1")
+        self.posted_ts = np.zeros(0, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.min_years)
+
+    @staticmethod
+    def _columns(jobs: List[Dict], posted_ts: Optional[np.ndarray] = None):
+        min_years = np.array([j.get("minYearsExperience") or 0 for j in jobs], dtype=np.float32)
+        remote = np.array([bool(j.get("remote", False)) for j in jobs], dtype=bool)
+        location = np.array([normalize_location(j.get("location")) for j in jobs], dtype=str)
+        if posted_ts is None:
+            posted_ts, _ = normalize_posted_dates(jobs)
+        return min_years, remote, location, np.asarray(posted_ts, dtype=np.float64)
+
+    def append(self, jobs: List[Dict], posted_ts: Optional[np.ndarray] = None):
+        """Add rows; posted_ts, when given, holds dates already parsed at ingest"""
+        if not jobs:
+            return
+        min_years, remote, location, posted_ts = self._columns(jobs, posted_ts)
+        self.min_years = np.concatenate([self.min_years, min_years])
+        self.remote = np.concatenate([self.remote, remote])
+        self.location = np.concatenate([self.location, location])
+        self.posted_ts = np.concatenate([self.posted_ts, posted_ts])
+
+    def copy(self):
+        """Shallow copy; columns are never written in place, so sharing them is safe"""
+        features = JobFeatures.__new__(JobFeatures)
+        features.min_years = self.min_years
+        features.remote = self.remote
+        features.location = self.location
+        features.posted_ts = self.posted_ts
+        return features
+
+    def keep(self, mask: np.ndarray):
+        """Drop every row where mask is False"""
+        self.min_years = self.min_years[mask]
+        self.remote = self.remote[mask]
+        self.location = self.location[mask]
+        self.posted_ts = self.posted_ts[mask]
+
+
+def rerank(features: JobFeatures, sims: np.ndarray,
+           user_location: Union[Optional[str], Sequence[Optional[str]]] = "",
+           years_experience: Union[Optional[int], Sequence[Optional[int]]] = 0,
+           idxs: Optional[np.ndarray] = None, now: Optional[datetime] = None,
+           weights: Optional[Dict[str, float]] = None, title_sims: Optional[np.ndarray] = None):
+    """Score candidate jobs for one user in a handful of array operations.
+
+    This is the single scoring path for every matcher. `sims` are cosine
+    similarities for the rows in `idxs`; when `idxs` is None they are taken
+    to cover the whole corpus. `title_sims` are cosine similarities between
+    the user's desired roles and each candidate's title, aligned with
+    `sims`; None or NaN scores a title as neutral. Returns the overall score
+    and each component as float arrays aligned with `sims`.
+
+    For several users at once pass 2D `sims` and `idxs` (one row per user),
+    one location and experience value per user, and either one weights dict
+    or one per user.
+    """
+    sims = np.asarray(sims, dtype=np.float64)
+    batched = sims.ndim == 2
+    weights = weights or weights_for()
+    if batched and isinstance(weights, (list, tuple)):
+        weights = {c: np.array([w[c] for w in weights])[:, None] for c in SCORE_COMPONENTS}
+    if idxs is None:
+        idxs = slice(None)
+    else:
+        idxs = np.asarray(idxs, dtype=np.int64)
+
+    min_years = features.min_years[idxs]
+    remote = features.remote[idxs]
+    location = features.location[idxs]
+    posted_ts = features.posted_ts[idxs]
+
+    skill = (sims + 1) / 2
+    if title_sims is None:
+        title = np.full(sims.shape, NEUTRAL_TITLE)
+    else:
+        title = (np.asarray(title_sims, dtype=np.float64) + 1) / 2
+        title = np.where(np.isnan(title), NEUTRAL_TITLE, title)
+
+    # Experience score
+    if batched:
+        user_years = np.array([float(y or 0) for y in years_experience])[:, None]
+    else:
+        user_years = float(years_experience or 0)
+    safe_min = np.where(min_years > 0, min_years, 1.0)
+    exp = np.where(min_years > 0, np.minimum(1.0, user_years / safe_min), 1.0)
+
+    # Location score: remote, or either location contains the other;
+    # neutral when either side has no location to compare
+    if batched:
+        user_locs = np.array([normalize_location(l) for l in user_location], dtype=str)[:, None]
+    else:
+        user_locs = np.array(normalize_location(user_location), dtype=str)
+    if len(location):
+        has_locs = (np.char.str_len(user_locs) > 0) & (np.char.str_len(location) > 0)
+        loc_match = has_locs & ((np.char.find(location, user_locs) >= 0) |
+                                (np.char.find(user_locs, location) >= 0))
+    else:
+        has_locs = loc_match = np.zeros(remote.shape, dtype=bool)
+    loc = np.where(remote | loc_match, 1.0, np.where(has_locs, 0.0, NEUTRAL_LOCATION))
+
+    # Recency score
+    now_ts = ((now or datetime.utcnow()) - EPOCH).total_seconds()
+    days_ago = np.floor((now_ts - posted_ts) / SECONDS_PER_DAY)
+    recency = np.where(np.isnan(days_ago), NEUTRAL_RECENCY, np.exp(-days_ago / 30.0))
+
+    scores = {
+        "skill": skill,
+        "experience": exp,
+        "title": title,
+        "location": loc,
+        "recency": recency,
+    }
+    scores["overall"] = sum(weights[c] * scores[c] for c in SCORE_COMPONENTS)
+    return scores
+
+
+def explain(scores: Dict[str, np.ndarray], weights: Dict[str, float], pos) -> Dict[str, Dict[str, float]]:
+    """Per-component score, weight and weighted contribution for one candidate"""
+    return {
+        c: {
+            "score": round(float(scores[c][pos]) * 100, 1),
+            "weight": weights[c],
+            "contribution": round(float(weights[c] * scores[c][pos]) * 100, 2),
+        }
+        for c in SCORE_COMPONENTS
+    }
@@ -0,0 +1,156 @@
+# backend/response_cache.py
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+
+class ResponseCache:
+    """TTL + LRU cache for upstream API responses with stale-while-revalidate.
+
+    Entries younger than `ttl` are served as is. Between `ttl` and
+    `ttl + stale_ttl` the stale value is served immediately while a
+    background thread refreshes it; the refresh sends the stored ETag so an
+    unchanged upstream answer only bumps the timestamp. Older entries are
+    fetched synchronously. An optional SQLite file keeps entries across
+    restarts.
+    """
+
+    def __init__(self, ttl: float = 300, stale_ttl: float = 3600, max_entries: int = 512,
+                 disk_path: Optional[str] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.not_modified = 0
+
+        self._conn = None
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    fetched_at REAL,
+                    etag TEXT,
+                    value TEXT
+                )
+            ''')
+            self._conn.commit()
+
+    def _load(self, key: str):
+        """(value, fetched_at, etag) from memory, then disk; None if absent"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                'SELECT value, fetched_at, etag FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = (json.loads(row[0]), row[1], row[2])
+        self._store_memory(key, entry)
+        return entry
+
+    def _store_memory(self, key: str, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: str, value: Any, etag: Optional[str] = None, fetched_at: Optional[float] = None):
+        entry = (value, fetched_at or time.time(), etag)
+        self._store_memory(key, entry)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                    (key, entry[1], etag, json.dumps(value))
+                )
+                self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value if it is younger than ttl, else None"""
+        entry = self._load(key)
+        if entry is not None and time.time() - entry[1] < self.ttl:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def get_or_fetch(self, key: str,
+                     fetch_fn: Callable[[Optional[str]], Tuple[Any, Optional[str], bool]]) -> Any:
+        """Return the cached value for key, fetching or refreshing as needed.
+
+        fetch_fn(etag) returns (value, etag, not_modified); when not_modified
+        is True the cached value is kept and only its age is reset.
+        """
+        entry = self._load(key)
+        if entry is not None:
+            value, fetched_at, etag = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh_in_background(key, fetch_fn, entry)
+                return value
+
+        self.misses += 1
+        return self._fetch(key, fetch_fn, entry)
+
+    def _fetch(self, key: str, fetch_fn, entry):
+        etag = entry[2] if entry is not None else None
+        value, new_etag, not_modified = fetch_fn(etag)
+        if not_modified and entry is not None:
+            self.not_modified += 1
+            value = entry[0]
+        self.put(key, value, new_etag or etag)
+        return value
+
+    def _refresh_in_background(self, key: str, fetch_fn, entry):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, fetch_fn, entry)
+                self.refreshes += 1
+            except Exception as e:
+                # Keep serving the stale value; the next request retries
+                print(f"Background refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "not_modified": self.not_modified,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "disk_path": self.disk_path,
+        }
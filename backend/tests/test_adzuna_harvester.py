@@ -0,0 +1,223 @@
+# backend/tests/test_adzuna_harvester.py
+"""AdzunaHarvester against a local stand-in for the Adzuna search API"""
+import asyncio
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from adzuna_harvester import AdzunaHarvester
+from adzuna_service import AdzunaService
+from response_cache import ResponseCache
+
+RESULTS_PER_PAGE = 50
+TOTAL_RESULTS = 120  # three pages: 50, 50, 20
+
+
+class StandIn:
+    """Serves /<country>/search/<page> like Adzuna.
+
+    `respond(what, page, attempt)` may return (status, body, headers) to
+    override the normal page, where attempt counts requests for that
+    (what, page) so far, starting at 0.
+    """
+
+    def __init__(self):
+        self.attempts = Counter()
+        self.requests = []
+        self.respond = lambda what, page, attempt: None
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                page = int(url.path.rsplit("/", 1)[1])
+                query = parse_qs(url.query)
+                what = query["what"][0]
+                rpp = int(query["results_per_page"][0])
+                attempt = stand_in.attempts[(what, page)]
+                stand_in.attempts[(what, page)] += 1
+                stand_in.requests.append((what, page))
+
+                override = stand_in.respond(what, page, attempt)
+                if override is not None:
+                    status, body, headers = override
+                else:
+                    status, headers = 200, {}
+                    first = (page - 1) * rpp
+                    body = json.dumps({
+                        "count": TOTAL_RESULTS,
+                        "results": [
+                            {"id": f"{what}-{n}", "title": "Python developer",
+                             "description": "3+ years experience with python",
+                             "created": "2024-01-01T00:00:00Z"}
+                            for n in range(first, min(first + rpp, TOTAL_RESULTS))
+                        ],
+                    })
+                data = body.encode() if isinstance(body, str) else body
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def pages(self, what):
+        return sorted(page for w, page in self.requests if w == what)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.close()
+
+
+def make_harvester(stand_in, **kwargs):
+    service = AdzunaService(cache=ResponseCache())
+    options = {"results_per_page": RESULTS_PER_PAGE, "max_pages": 5, "max_retries": 3,
+               "backoff_base": 0.0, "timeout": 5.0}
+    options.update(kwargs)
+    return AdzunaHarvester(service=service, base_url=stand_in.url, **options)
+
+
+def collect(harvester, queries, locations=("gauteng",), max_pages=None):
+    async def run():
+        jobs = []
+        async for batch in harvester.harvest(queries, locations, max_pages=max_pages):
+            jobs.extend(batch)
+        return jobs
+    return asyncio.run(run())
+
+
+def test_fetches_every_page_of_every_pair(stand_in):
+    harvester = make_harvester(stand_in)
+    jobs = collect(harvester, ["python", "java"])
+
+    assert len(jobs) == 2 * TOTAL_RESULTS
+    assert len({job["id"] for job in jobs}) == 2 * TOTAL_RESULTS
+    assert stand_in.pages("python") == [1, 2, 3]
+    assert stand_in.pages("java") == [1, 2, 3]
+    assert harvester.pages_fetched == 6
+    # The whole result set was read, so the next harvest starts over
+    assert harvester.cursors[("python", "gauteng")] == 1
+
+
+def test_jobs_are_transformed(stand_in):
+    jobs = collect(make_harvester(stand_in), ["python"])
+    job = jobs[0]
+    assert job["title"] == "Python developer"
+    assert job["minYearsExperience"] == 3
+    assert job["postedDate"] == "2024-01-01T00:00:00Z"
+
+
+def test_retries_rate_limits_and_server_errors(stand_in):
+    def respond(what, page, attempt):
+        if page == 2 and attempt == 0:
+            return 429, "slow down", {"Retry-After": "0"}
+        if page == 2 and attempt == 1:
+            return 503, "unavailable", {}
+        if page == 3 and attempt == 0:
+            return 500, "oops", {}
+        return None
+
+    stand_in.respond = respond
+    harvester = make_harvester(stand_in)
+    jobs = collect(harvester, ["python"])
+
+    assert len(jobs) == TOTAL_RESULTS
+    assert harvester.retries == 3
+    assert stand_in.attempts[("python", 2)] == 3
+    assert stand_in.attempts[("python", 3)] == 2
+
+
+def test_gives_up_after_max_retries(stand_in):
+    stand_in.respond = lambda what, page, attempt: (503, "down", {}) if page == 2 else None
+    harvester = make_harvester(stand_in, max_retries=2)
+    jobs = collect(harvester, ["python"])
+
+    # Pages 1 and 3 still arrive
+    assert len(jobs) == TOTAL_RESULTS - RESULTS_PER_PAGE
+    assert stand_in.attempts[("python", 2)] == 3
+    assert harvester.retries == 2
+
+
+def test_client_errors_are_not_retried(stand_in):
+    stand_in.respond = lambda what, page, attempt: (401, "bad key", {})
+    harvester = make_harvester(stand_in)
+    assert collect(harvester, ["python"]) == []
+    assert stand_in.attempts[("python", 1)] == 1
+    assert harvester.retries == 0
+
+
+def test_malformed_page_does_not_abort_other_pairs(stand_in):
+    def respond(what, page, attempt):
+        if what == "python" and page == 2:
+            return 200, "<html>not json</html>", {}
+        if what == "java" and page == 1:
+            return 200, "[]", {}
+        return None
+
+    stand_in.respond = respond
+    jobs = collect(make_harvester(stand_in), ["python", "java", "go"])
+    by_query = Counter(job["id"].split("-")[0] for job in jobs)
+
+    assert by_query["python"] == TOTAL_RESULTS - RESULTS_PER_PAGE
+    assert by_query["java"] == 0
+    assert by_query["go"] == TOTAL_RESULTS
+
+
+def test_cursor_continues_then_wraps_around(stand_in):
+    harvester = make_harvester(stand_in, max_pages=2)
+    pair = ("python", "gauteng")
+
+    first = collect(harvester, ["python"])
+    assert len(first) == 2 * RESULTS_PER_PAGE
+    assert harvester.cursors[pair] == 3
+
+    second = collect(harvester, ["python"])
+    assert len(second) == TOTAL_RESULTS - 2 * RESULTS_PER_PAGE
+    assert harvester.cursors[pair] == 1
+
+    third = collect(harvester, ["python"])
+    assert {job["id"] for job in third} == {job["id"] for job in first}
+    assert stand_in.pages("python") == [1, 1, 2, 2, 3]
+
+
+def test_cursor_past_the_end_resets(stand_in):
+    harvester = make_harvester(stand_in)
+    harvester.cursors[("python", "gauteng")] = 7
+
+    assert collect(harvester, ["python"]) == []
+    assert harvester.cursors[("python", "gauteng")] == 1
+    assert len(collect(harvester, ["python"])) == TOTAL_RESULTS
+
+
+def test_harvest_into_reports_totals(stand_in):
+    harvester = make_harvester(stand_in)
+    batches = []
+
+    def ingest(batch):
+        batches.append(batch)
+        return {"ingested": len(batch), "embedded": len(batch)}
+
+    result = asyncio.run(harvester.harvest_into(ingest, ["python"], ["gauteng"]))
+    assert result["jobs_found"] == TOTAL_RESULTS
+    assert result["jobs_ingested"] == TOTAL_RESULTS
+    assert result["pages_fetched"] == 3
+    assert [len(b) for b in sorted(batches, key=len, reverse=True)] == [50, 50, 20]
@@ -0,0 +1,52 @@
+# backend/tests/test_job_filters.py
+"""FilterIndex bitmaps and the row counts that size filtered searches"""
+from datetime import datetime
+
+import numpy as np
+
+from job_filters import FilterIndex, make_filter
+from reranker import JobFeatures
+
+NOW = datetime(2024, 6, 1)
+
+
+def build(jobs, alive=None):
+    features = JobFeatures()
+    features.append(jobs)
+    if alive is None:
+        alive = np.ones(len(jobs), dtype=bool)
+    return FilterIndex(features, alive)
+
+
+def test_counts_rows_in_the_last_partial_byte():
+    jobs = [{"remote": n >= 1000} for n in range(1003)]
+    filters = build(jobs)
+
+    bitmap, count = filters.bitmap(make_filter(remote=True))
+    assert count == 3
+    assert np.flatnonzero(filters.unpack(bitmap)).tolist() == [1000, 1001, 1002]
+
+
+def test_counts_match_on_fewer_rows_than_a_byte():
+    jobs = [
+        {"remote": False, "location": "Cape Town"},
+        {"remote": True, "location": "Johannesburg"},
+        {"remote": False, "location": "Durban", "postedDate": "2024-05-30T00:00:00Z"},
+    ]
+    filters = build(jobs)
+
+    assert filters.bitmap(make_filter(remote=True), NOW)[1] == 1
+    assert filters.bitmap(make_filter(locations=["durban"]), NOW)[1] == 1
+    assert filters.bitmap(make_filter(posted_within_days=3650), NOW)[1] == 1
+    assert filters.bitmap(make_filter(remote=False), NOW)[1] == 2
+
+
+def test_dead_rows_are_not_counted():
+    jobs = [{"remote": True} for _ in range(11)]
+    alive = np.ones(11, dtype=bool)
+    alive[[3, 10]] = False
+    filters = build(jobs, alive)
+
+    bitmap, count = filters.bitmap(make_filter(remote=True))
+    assert count == 9
+    assert not filters.unpack(bitmap)[[3, 10]].any()
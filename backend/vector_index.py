@@ -0,0 +1,369 @@
+# backend/vector_index.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except Exception:
+    FAISS_AVAILABLE = False
+
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# FAISS scalar quantizer per embedding precision; ivf_pq is compact already
+SQ_TYPES = {"float16": "QT_fp16", "int8": "QT_8bit"}
+# Kinds that need a k-means training pass before vectors can be added
+TRAINED_KINDS = ("ivf_flat", "ivf_pq")
+# Rows scored per block by the NumPy exact search
+EXACT_CHUNK_ROWS = int(os.getenv("EXACT_SEARCH_CHUNK_ROWS", "65536"))
+# Rows decoded and added per call when building from compact embeddings
+ADD_CHUNK_ROWS = 65536
+SQ_TRAIN_ROWS = 65536
+
+
+class IndexConfig:
+    """Vector index settings, read from VECTOR_INDEX_* environment variables"""
+
+    def __init__(self, kind: str = "flat", train_threshold: int = 50000, nlist: int = 0,
+                 nprobe: int = 16, pq_m: int = 48, hnsw_m: int = 32,
+                 ef_construction: int = 80, ef_search: int = 64, path: Optional[str] = None,
+                 precision: str = "float32"):
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown vector index kind '{kind}', expected one of {INDEX_KINDS}")
+        if precision != "float32" and precision not in SQ_TYPES:
+            raise ValueError(f"Unknown index precision '{precision}', expected float32 or one of {tuple(SQ_TYPES)}")
+        self.kind = kind
+        self.train_threshold = train_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.path = path
+        self.precision = precision
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            kind=os.getenv("VECTOR_INDEX_KIND", "flat"),
+            train_threshold=int(os.getenv("VECTOR_INDEX_TRAIN_THRESHOLD", "50000")),
+            nlist=int(os.getenv("VECTOR_INDEX_NLIST", "0")),
+            nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", "16")),
+            pq_m=int(os.getenv("VECTOR_INDEX_PQ_M", "48")),
+            hnsw_m=int(os.getenv("VECTOR_INDEX_HNSW_M", "32")),
+            ef_construction=int(os.getenv("VECTOR_INDEX_EF_CONSTRUCTION", "80")),
+            ef_search=int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64")),
+            path=os.getenv("VECTOR_INDEX_PATH") or None,
+            precision=os.getenv("EMBEDDING_PRECISION", "float32")
+        )
+
+    def nlist_for(self, n: int) -> int:
+        if self.nlist:
+            return self.nlist
+        return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; a waiting writer blocks new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class VectorIndex:
+    """Inner-product FAISS index whose type is chosen by IndexConfig.
+
+    IVF kinds need training, so below `train_threshold` vectors they are
+    served by an exact flat index; `needs_rebuild` turns True once the
+    corpus grows past the threshold and the owner should rebuild. An int8
+    scalar quantizer trained on a small corpus also asks for a rebuild each
+    time the corpus doubles, so its ranges aren't set by the first batch.
+
+    Vectors are appended in place while published snapshots search the
+    same index: add() waits for running searches and holds new ones off
+    for the few milliseconds it takes. Snapshots ignore ids at or past
+    their own row count, so appended rows never leak into older views.
+    """
+
+    def __init__(self, index, kind: str, config: IndexConfig, trained_rows: Optional[int] = None):
+        self.index = index
+        self.kind = kind
+        self.config = config
+        self.trained_rows = trained_rows
+        self._lock = ReadWriteLock()
+
+    @property
+    def precision(self) -> str:
+        """Precision the index actually stores its vectors at"""
+        if self.kind == "ivf_pq":
+            return "pq"
+        index = faiss.downcast_index(self.index.storage) if self.kind == "hnsw" else self.index
+        if hasattr(index, "sq"):
+            for precision, qtype in SQ_TYPES.items():
+                if index.sq.qtype == getattr(faiss.ScalarQuantizer, qtype):
+                    return precision
+        return "float32"
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def needs_rebuild(self) -> bool:
+        if (self.precision == "int8" and self.trained_rows is not None
+                and self.trained_rows < SQ_TRAIN_ROWS and self.ntotal >= 2 * self.trained_rows):
+            return True
+        return (self.kind != self.config.kind and self.config.kind in TRAINED_KINDS
+                and self.ntotal >= self.config.train_threshold)
+
+    @classmethod
+    def build(cls, embs: np.ndarray, config: Optional[IndexConfig] = None,
+              decode: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        """Build from embs; `decode` turns compact rows back into float32,
+        which is then done ADD_CHUNK_ROWS at a time."""
+        config = config or IndexConfig.from_env()
+        decode = decode or (lambda rows: rows)
+        n, d = embs.shape
+
+        kind = config.kind
+        if kind in TRAINED_KINDS and n < config.train_threshold:
+            kind = "flat"
+
+        sq_type = None
+        if config.precision in SQ_TYPES and kind != "ivf_pq":
+            sq_type = getattr(faiss.ScalarQuantizer, SQ_TYPES[config.precision])
+        # Scalar quantizers only learn per-dimension ranges
+        max_train = SQ_TRAIN_ROWS
+        if kind == "flat":
+            if sq_type is None:
+                index = faiss.IndexFlatIP(d)
+            else:
+                index = faiss.IndexScalarQuantizer(d, sq_type, faiss.METRIC_INNER_PRODUCT)
+        elif kind == "hnsw":
+            if sq_type is None:
+                index = faiss.IndexHNSWFlat(d, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexHNSWSQ(d, sq_type, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = config.ef_construction
+            index.hnsw.efSearch = config.ef_search
+        else:
+            nlist = config.nlist_for(n)
+            quantizer = faiss.IndexFlatIP(d)
+            if kind == "ivf_pq":
+                index = faiss.IndexIVFPQ(quantizer, d, nlist, config.pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+            elif sq_type is None:
+                index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, sq_type, faiss.METRIC_INNER_PRODUCT)
+            # A few hundred points per centroid is plenty for k-means
+            max_train = nlist * 256
+            index.nprobe = config.nprobe
+
+        trained_rows = None
+        if not index.is_trained:
+            sample = embs
+            if n > max_train:
+                sample = embs[np.sort(np.random.default_rng(0).choice(n, max_train, replace=False))]
+            sample = np.ascontiguousarray(decode(sample), dtype=np.float32)
+            start = time.time()
+            index.train(sample)
+            trained_rows = len(sample)
+            print(f"Trained {kind} index on {len(sample)} vectors in {time.time() - start:.1f}s")
+
+        for start in range(0, n, ADD_CHUNK_ROWS):
+            index.add(np.ascontiguousarray(decode(embs[start:start + ADD_CHUNK_ROWS]), dtype=np.float32))
+        return cls(index, kind, config, trained_rows)
+
+    def add(self, embs: np.ndarray):
+        embs = np.ascontiguousarray(embs, dtype=np.float32)
+        with self._lock.exclusive():
+            self.index.add(embs)
+
+    def _search_params(self, nprobe: Optional[int], ef_search: Optional[int], selector=None):
+        if self.kind in TRAINED_KINDS and (nprobe is not None or selector is not None):
+            # Unset fields would fall back to FAISS defaults, not the index's own
+            params = faiss.SearchParametersIVF(nprobe=nprobe or self.index.nprobe)
+        elif self.kind == "hnsw" and (ef_search is not None or selector is not None):
+            params = faiss.SearchParametersHNSW(efSearch=ef_search or self.index.hnsw.efSearch)
+        elif selector is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        if selector is not None:
+            params.sel = selector
+        return params
+
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None, bitmap: Optional[np.ndarray] = None):
+        """Top-k search; `bitmap` (little-endian packed, one bit per id)
+        restricts results to the ids whose bit is set."""
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        selector = None
+        if bitmap is not None:
+            bitmap = np.ascontiguousarray(bitmap, dtype=np.uint8)
+            selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        params = self._search_params(nprobe, ef_search, selector)
+        with self._lock.shared():
+            if params is not None:
+                # bitmap stays referenced until the search returns
+                return self.index.search(queries, k, params=params)
+            return self.index.search(queries, k)
+
+    def save(self, path: Optional[str] = None, fingerprint: Optional[str] = None):
+        """Write the index, plus a sidecar identifying the rows it was built from"""
+        path = path or self.config.path
+        tmp_path = f"{path}.tmp"
+        with self._lock.shared():
+            ntotal = self.ntotal
+            faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+        with open(f"{path}.meta.json", "w") as f:
+            json.dump({"ntotal": ntotal, "kind": self.kind, "fingerprint": fingerprint}, f)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, config: Optional[IndexConfig] = None,
+             fingerprint: Optional[str] = None):
+        """Read a saved index; None if missing or built from different rows"""
+        config = config or IndexConfig.from_env()
+        path = path or config.path
+        if not path or not os.path.exists(path):
+            return None
+        if fingerprint is not None:
+            try:
+                with open(f"{path}.meta.json") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if meta.get("fingerprint") != fingerprint:
+                print(f"Saved index at {path} doesn't match the loaded jobs, rebuilding")
+                return None
+        index = faiss.read_index(path)
+        if isinstance(index, faiss.IndexHNSW):
+            kind = "hnsw"
+            index.hnsw.efSearch = config.ef_search
+        elif isinstance(index, faiss.IndexIVFPQ):
+            kind = "ivf_pq"
+        elif isinstance(index, (faiss.IndexIVFFlat, faiss.IndexIVFScalarQuantizer)):
+            kind = "ivf_flat"
+        else:
+            kind = "flat"
+        if kind in TRAINED_KINDS:
+            index.nprobe = config.nprobe
+        return cls(index, kind, config)
+
+    def describe(self):
+        info = {"kind": self.kind, "configured_kind": self.config.kind, "ntotal": self.ntotal,
+                "precision": self.precision}
+        if self.kind in TRAINED_KINDS:
+            info["nlist"] = self.index.nlist
+            info["nprobe"] = self.index.nprobe
+        if self.kind == "hnsw":
+            info["ef_search"] = self.index.hnsw.efSearch
+        return info
+
+
+def exact_search(embs: np.ndarray, queries: np.ndarray, k: int,
+                 chunk_size: int = EXACT_CHUNK_ROWS, mask: Optional[np.ndarray] = None, codec=None):
+    """Exact inner-product top-k for a batch of queries without FAISS.
+
+    Scores `chunk_size` rows of the matrix at a time so peak memory stays at
+    queries x chunk_size floats, and keeps a running top-k per query with
+    np.argpartition instead of sorting every similarity. Rows where `mask`
+    is False are skipped. Returns (scores, ids) shaped like FAISS results,
+    padded with -inf / -1 when fewer than k rows qualify.
+
+    Compact (float16 / int8) matrices are scored as they are, one float32
+    block at a time; pass their EmbeddingCodec so int8 scales are applied.
+    """
+    queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+    if codec is not None:
+        queries = codec.scale_queries(queries)
+    nq, n = len(queries), embs.shape[0]
+    k = max(0, min(k, n))
+    best_scores = np.empty((nq, 0), dtype=np.float32)
+    best_ids = np.empty((nq, 0), dtype=np.int64)
+    if k == 0:
+        return best_scores, best_ids
+
+    for start in range(0, n, chunk_size):
+        block = np.asarray(embs[start:start + chunk_size], dtype=np.float32)
+        sims = queries @ block.T
+        ids = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int64), sims.shape)
+        if mask is not None:
+            sims[:, ~mask[start:start + len(block)]] = -np.inf
+
+        scores = np.concatenate([best_scores, sims], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        if scores.shape[1] > k:
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, part, axis=1)
+            ids = np.take_along_axis(ids, part, axis=1)
+        best_scores, best_ids = scores, ids
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_ids = np.take_along_axis(best_ids, order, axis=1)
+    best_ids[np.isneginf(best_scores)] = -1
+    return best_scores, best_ids
+
+
+def recall_at_k(index: VectorIndex, embs: np.ndarray, queries: np.ndarray, k: int = 10,
+                nprobe: Optional[int] = None, ef_search: Optional[int] = None, codec=None):
+    """Recall of the approximate index against exact flat search, with latencies"""
+    queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+
+    start = time.perf_counter()
+    _, truth = exact_search(embs, queries, k, codec=codec)
+    exact_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    _, approx = index.search(queries, k, nprobe=nprobe, ef_search=ef_search)
+    approx_ms = (time.perf_counter() - start) * 1000
+
+    hits = sum(len(set(a[a >= 0].tolist()) & set(t[t >= 0].tolist())) for a, t in zip(approx, truth))
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall": round(hits / truth.size, 4) if truth.size else 0.0,
+        "index_ms_per_query": round(approx_ms / len(queries), 3),
+        "exact_ms_per_query": round(exact_ms / len(queries), 3),
+        **index.describe(),
+    }